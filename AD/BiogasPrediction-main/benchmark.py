@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the continuous biogas model.
+
+Times the full pipeline (database load, run_model, check-up report and csv
+output, without the plot) and the scenario evaluation, and records the peak
+memory of every case (tracemalloc, numpy allocations included). The cases
+scale one dimension at a time:
+
+    tm          time span (d)
+    substrates  number of substrates in the database
+    changes     number of substrate changes of the schedule
+    scenarios   number of scenarios of evaluate_scenarios
+    inventory   number of substrates of optimize_shares (every objective; the
+                run fails if an optimum does not pass the model's check-up)
+
+All databases are synthetic (same columns as Database_CoAgrowPlus.csv, fixed
+seed), so the suite runs offline.
+
+    python benchmark.py --save-baseline      # store benchmark_baseline.json
+    python benchmark.py                      # compare with the baseline
+
+The committed benchmark_baseline.json holds all cases of a full run on the
+reference machine (its environment is stored with the times). Times depend
+on the hardware, so on another machine record a baseline there first. A
+--quick run is only compared with a --quick baseline: the time of a case
+also depends on the cases before it (memory the allocator already holds).
+
+A case is flagged if it is slower than the baseline by more than the
+threshold factor; the exit code is 1 if any case is flagged.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import model
+from kinetics import curve_cache
+from model import ModelConfig, run_model
+from optimizer import OBJECTIVES, optimize_shares
+from scenarios import evaluate_scenarios
+from schedule import FeedSchedule
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+THRESHOLD = 1.5  # flag cases slower than THRESHOLD x baseline
+
+DEFAULTS = {
+    "tm": 365,
+    "substrates": 30,
+    "changes": 4,
+    "scenarios": 100,
+    "inventory": 10,
+}
+SWEEPS = {
+    "tm": [200, 1000, 3650, 7300],
+    "substrates": [3, 30, 300, 3000],
+    "changes": [1, 10, 100, 1000],
+    "scenarios": [10, 100, 1000, 10000],
+    "inventory": [3, 10, 30],
+}
+QUICK_SWEEPS = {
+    "tm": [200, 3650],
+    "substrates": [3, 300],
+    "changes": [1, 100],
+    "scenarios": [10, 1000],
+    "inventory": [3, 30],
+}
+
+
+def synthetic_database(n, seed=0):
+    """Synthetic database of n substrates (columns of Database_CoAgrowPlus.csv)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "Short": [f"Sub{i+1}" for i in range(n)],
+            "WC": rng.uniform(0.1, 0.9, n).round(4),
+            "VS": rng.uniform(0.75, 0.95, n).round(4),
+            "P": rng.integers(200, 600, n),
+            "Rm": rng.integers(5, 40, n),
+            "l": rng.integers(0, 5, n),
+            "C": rng.integers(350, 500, n),
+            "N": rng.integers(10, 60, n),
+            "methane": rng.uniform(0.5, 0.7, n).round(2),
+        }
+    )
+
+
+def synthetic_schedule(shorts, changes, tm, HRT=30, BR=2.5, seed=0):
+    """Schedule with `changes` substrate changes spread evenly over tm."""
+    rng = np.random.default_rng(seed)
+    schedule = FeedSchedule()
+    starts = np.linspace(0, tm, changes + 1, endpoint=False).astype(int)
+    for start in starts:
+        names = rng.choice(shorts, size=min(3, len(shorts)), replace=False)
+        shares = rng.dirichlet(np.ones(len(names)))
+        schedule.add(start, dict(zip(names, shares)), HRT, BR)
+    return schedule
+
+
+def _measure(fn, repeat):
+    """Median wall time (s) of `repeat` calls and the peak memory (MiB) of one."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return float(np.median(times)), peak / 2**20
+
+
+def pipeline_case(folder, tm, substrates, changes, **_):
+    """Full model run from the database file to the csv output."""
+    db_path = os.path.join(folder, f"db_{substrates}.csv")
+    if not os.path.exists(db_path):
+        synthetic_database(substrates).to_csv(db_path, sep=";", index=False)
+    shorts = [f"Sub{i+1}" for i in range(substrates)]
+    schedule = synthetic_schedule(shorts, changes, tm)
+    out_path = os.path.join(folder, "out.csv")
+
+    def run():
+        # cold start: no parsed database and no Gompertz curves in memory
+        model._registries.clear()
+        curve_cache.clear()
+        config = ModelConfig(VF=700, tm=tm, schedule=schedule, database=db_path)
+        result = run_model(config)
+        result.report()
+        result.save_csv(out_path)
+
+    return run
+
+
+def scenarios_case(folder, tm, substrates, scenarios, **_):
+    """evaluate_scenarios with daily production series."""
+    data = synthetic_database(substrates)
+    rng = np.random.default_rng(0)
+    shares = rng.dirichlet(np.ones(substrates), size=scenarios)
+    HRT = rng.integers(20, 50, scenarios)
+
+    def run():
+        curve_cache.clear()
+        evaluate_scenarios(data, HRT, 2.5, 700, shares, tm=tm)
+
+    return run
+
+
+def optimizer_case(folder, substrates, inventory, **_):
+    """optimize_shares for every objective, checked with the model's check-up."""
+    data = synthetic_database(max(substrates, inventory))
+    names = data["Short"].tolist()[:inventory]
+
+    def run():
+        for objective in OBJECTIVES:
+            optimum = optimize_shares(data, names, 700, 30, 2.5, objective=objective)
+            checks = optimum.mix[["Share_ok", "BR_ok", "CN_ok", "WC_Mashed_ok"]]
+            if optimum.success and not checks.all():
+                raise RuntimeError(
+                    f"optimum for {objective} fails the check-up: {checks.to_dict()}"
+                )
+
+    return run
+
+
+FACTORIES = {"scenarios": scenarios_case, "inventory": optimizer_case}
+
+
+def cases(sweeps):
+    """(name, case factory, parameters) of all benchmark cases."""
+    for dimension, values in sweeps.items():
+        factory = FACTORIES.get(dimension, pipeline_case)
+        for value in values:
+            params = dict(DEFAULTS, **{dimension: value})
+            yield f"{factory.__name__[:-5]}/{dimension}={value}", factory, params
+
+
+def run_benchmarks(sweeps=SWEEPS, repeat=5, log=print):
+    """Run all cases, returns {case name: {"time": s, "peak_mib": MiB, ...}}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, factory, params in cases(sweeps):
+            run = factory(folder, **params)
+            run()  # warm up (imports, database cache file)
+            seconds, peak = _measure(run, repeat)
+            results[name] = {"time": seconds, "peak_mib": peak, **params}
+            if log:
+                log(f"{name:32s} {seconds*1000:10.2f} ms {peak:10.1f} MiB")
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Cases slower than threshold x baseline: [(name, time, baseline time)]."""
+    slower = []
+    for name, result in results.items():
+        reference = baseline.get("cases", {}).get(name)
+        if reference is not None and result["time"] > threshold * reference["time"]:
+            slower.append((name, result["time"], reference["time"]))
+    return slower
+
+
+def _environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store the results as baseline"
+    )
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="fewer, smaller cases")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(QUICK_SWEEPS if args.quick else SWEEPS, args.repeat)
+    report = {"environment": _environment(), "quick": args.quick, "cases": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("quick", False) != args.quick:
+        recorded = "with" if baseline.get("quick", False) else "without"
+        print(
+            f"the baseline was recorded {recorded} --quick, record one with the "
+            "same option to compare"
+        )
+        return 0
+    slower = compare(results, baseline, args.threshold)
+    for name, seconds, reference in slower:
+        print(
+            f"✘ {name} is {seconds/reference:.2f}x slower than the baseline "
+            f"({seconds*1000:.2f} ms instead of {reference*1000:.2f} ms)"
+        )
+    if not slower:
+        print(
+            f"\N{CHECK MARK} no case is more than {args.threshold}x slower than "
+            "the baseline"
+        )
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
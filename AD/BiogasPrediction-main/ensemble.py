@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo ensemble of the continuous biogas model.
+
+The kinetic parameters (P, Rm, l) and the composition (WC, VS, C, N, methane)
+of the substrates scatter between batch tests. The ensemble samples them from
+user-given distributions, runs the production model for every draw and
+aggregates the daily reactor production with streaming quantile estimators
+(P-square algorithm, Jain & Chlamtac 1985). Draws are processed in chunks, so
+no draws x days matrix larger than one chunk is ever kept in memory.
+
+Example:
+    distributions = {
+        ("Sample1", "P"): ("normal", 350, 25),
+        ("Sample2", "Rm"): ("uniform", 12, 18),
+    }
+    result = run_ensemble(data, schedule, VF, tm, distributions, n_draws=10000, seed=1)
+    result.to_frame()  # P10 / P50 / P90 per day
+"""
+
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from kinetics import Gompertz_Function
+from production import segment_production
+from substrates import as_registry
+
+PARAMETERS = ["WC", "VS", "P", "Rm", "l", "C", "N", "methane"]
+
+
+class P2Quantiles:
+    """
+    Streaming estimate of several quantiles of every element of a series
+    (e.g. every day of the production), P-square algorithm.
+
+    Memory is 5 markers per quantile and element, independent of the number
+    of observations.
+    """
+
+    def __init__(self, quantiles, shape):
+        self.p = np.asarray(quantiles, dtype=float)
+        self.shape = (len(self.p),) + tuple(np.atleast_1d(shape))
+        self.count = 0
+        self._first = []  # the first 5 observations initialise the markers
+        p = self.p.reshape((-1,) + (1,) * (len(self.shape) - 1))
+        self._dn = np.stack([0 * p, p / 2, p, (1 + p) / 2, 1 + 0 * p])
+
+    def update(self, x):
+        """Add one observation (an array of the series shape)."""
+        x = np.broadcast_to(np.asarray(x, dtype=float), self.shape[1:])
+        self.count += 1
+        if self.count <= 5:
+            self._first.append(np.array(x))
+            if self.count == 5:
+                self._initialise()
+            return
+        q, n = self.q, self.n
+
+        # cell k of the new observation, extreme markers are moved if needed
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        k = (x >= q[1]).astype(int) + (x >= q[2]) + (x >= q[3])
+        # positions of the markers above the cell are increased by one
+        n += np.arange(5).reshape((5,) + (1,) * (n.ndim - 1)) > k
+        self.n_desired += self._dn
+
+        for i in (1, 2, 3):
+            d = self.n_desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | (
+                (d <= -1) & (n[i - 1] - n[i] < -1)
+            )
+            if not move.any():
+                continue
+            d = np.sign(d) * move
+            # parabolic prediction of the marker height
+            q_par = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            # linear prediction if the parabola leaves the neighbour markers
+            q_next = np.where(d > 0, q[i + 1], q[i - 1])
+            n_next = np.where(d > 0, n[i + 1], n[i - 1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                q_lin = q[i] + d * (q_next - q[i]) / (n_next - n[i])
+            ok = (q[i - 1] < q_par) & (q_par < q[i + 1])
+            q[i] = np.where(move, np.where(ok, q_par, q_lin), q[i])
+            n[i] += d
+
+    def update_many(self, X):
+        """Add several observations (first axis = observations)."""
+        for x in X:
+            self.update(x)
+
+    def _initialise(self):
+        first = np.sort(np.stack(self._first), axis=0)
+        self.q = np.broadcast_to(first[:, None], (5,) + self.shape).copy()
+        self.n = np.broadcast_to(
+            np.arange(1.0, 6.0).reshape((5,) + (1,) * len(self.shape)),
+            (5,) + self.shape,
+        ).copy()
+        self.n_desired = 1 + 4 * self._dn * np.ones(self.shape)
+        self._first = []
+
+    def result(self):
+        """Current quantile estimates (quantiles x series shape)."""
+        if self.count == 0:
+            return np.full(self.shape, np.nan)
+        if self.count < 5:
+            return np.quantile(np.stack(self._first), self.p, axis=0)
+        return self.q[2].copy()
+
+
+@dataclass
+class EnsembleResult:
+    quantiles: np.ndarray  # quantile levels, e.g. [0.1, 0.5, 0.9]
+    BGP: np.ndarray  # biogas production (quantiles x tm, L/d)
+    MP: np.ndarray  # methane production (quantiles x tm, L/d)
+    BGP_mean: np.ndarray  # mean biogas production (tm, L/d)
+    MP_mean: np.ndarray  # mean methane production (tm, L/d)
+    n_draws: int
+
+    def to_frame(self):
+        """Daily quantiles as DataFrame, columns e.g. biogasP10, methaneP90."""
+        frame = pd.DataFrame({"day": range(self.BGP.shape[1])})
+        for k, p in enumerate(self.quantiles):
+            frame[f"biogasP{100 * p:g}"] = self.BGP[k]
+        for k, p in enumerate(self.quantiles):
+            frame[f"methaneP{100 * p:g}"] = self.MP[k]
+        frame["biogasMean"] = self.BGP_mean
+        frame["methaneMean"] = self.MP_mean
+        return frame
+
+
+def sample_parameters(data, distributions, n, rng):
+    """
+    Draw n samples of the substrate parameters.
+
+    distributions: {(short name, column): spec} where spec is either a tuple
+    (name of a numpy.random.Generator method, *arguments), e.g.
+    ("normal", 350, 25), or a callable f(rng, n). Parameters without a
+    distribution keep their database value. Returns {column: array (n x substrates)}.
+
+    run_ensemble sends the distributions to worker processes, so callables
+    have to be module-level functions of an importable module; lambdas and
+    local functions make it run in the calling process instead.
+    """
+    index = {name: i for i, name in enumerate(data["Short"])}
+    params = {
+        col: np.tile(data[col].to_numpy(dtype=float), (n, 1)) for col in PARAMETERS
+    }
+    for (short, col), spec in distributions.items():
+        if col not in params:
+            raise KeyError(f"{col!r} is not a substrate parameter ({PARAMETERS})")
+        if short not in index:
+            raise KeyError(f"substrate {short!r} is not in the database")
+        if callable(spec):
+            draws = spec(rng, n)
+        else:
+            draws = getattr(rng, spec[0])(*spec[1:], size=n)
+        params[col][:, index[short]] = draws
+    return params
+
+
+def ensemble_production(params, shares, VF, HRT, BR, starts, stops, tm):
+    """
+    Daily reactor biogas and methane production for every draw (draws x tm).
+
+    params: sampled substrate parameters (see sample_parameters)
+    shares: share matrix (segments x substrates); HRT, BR, starts, stops per segment
+    """
+    n, nseg = len(params["P"]), len(shares)
+    DM = 1 - params["WC"]
+    VS_mix = (DM * params["VS"]) @ shares.T  # (draws x segments)
+    methane_mix = params["methane"] @ shares.T
+    Feed = VF * np.asarray(BR) / VS_mix  # (kg FM/d)
+    VS_feed = Feed * VS_mix  # (kgVS/d)
+
+    days = np.arange(np.max(HRT) + 1, dtype=float)
+    P, Rm, l = (params[c][:, :, None] for c in ("P", "Rm", "l"))
+    BGP_substrates = Gompertz_Function(days, P, Rm, l)
+    BGP_perkgVS = np.einsum("sj,njd->nsd", shares, BGP_substrates)
+
+    BGP = segment_production(
+        BGP_perkgVS.reshape(n * nseg, -1),
+        np.tile(HRT, n),
+        np.tile(starts, n),
+        np.tile(stops, n),
+        VS_feed.ravel(),
+        tm,
+    ).reshape(n, nseg, tm)
+    MP = np.einsum("nst,ns->nt", BGP, methane_mix)
+    return BGP.sum(axis=1), MP
+
+
+def _ensemble_chunk(args):
+    data, distributions, n, seed, model = args
+    rng = np.random.default_rng(seed)
+    params = sample_parameters(data, distributions, n, rng)
+    return ensemble_production(params, *model)
+
+
+def run_ensemble(
+    data,
+    schedule,
+    VF,
+    tm,
+    distributions,
+    n_draws=1000,
+    seed=None,
+    quantiles=(0.1, 0.5, 0.9),
+    chunk_size=500,
+    workers=None,
+):
+    """
+    Monte Carlo ensemble of the daily production of a feed schedule.
+
+    The draws are split into chunks of chunk_size, each with its own random
+    stream spawned from seed, so the result only depends on seed and
+    chunk_size, not on the number of workers. workers=None uses all CPUs,
+    workers=0 runs in the calling process (also used if the distributions
+    cannot be pickled, e.g. lambdas).
+    """
+    registry = as_registry(data)
+    shares = schedule.share_matrix(registry)
+    stops = np.minimum(schedule.stops(tm), tm)
+    model = (shares, VF, schedule.HRT, schedule.BR, schedule.starts, stops, tm)
+    data = registry.data[["Short"] + PARAMETERS]
+
+    sizes = [chunk_size] * (n_draws // chunk_size)
+    if n_draws % chunk_size:
+        sizes.append(n_draws % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(data, distributions, m, s, model) for m, s in zip(sizes, seeds)]
+
+    # biogas and methane are aggregated together (2 x tm per draw)
+    estimator = P2Quantiles(quantiles, (2, tm))
+    total = np.zeros([2, tm])
+
+    def collect(BGP, MP):
+        estimator.update_many(np.stack([BGP, MP], axis=1))
+        total[0] += BGP.sum(axis=0)
+        total[1] += MP.sum(axis=0)
+
+    if workers != 0:
+        try:
+            pickle.dumps(distributions)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            # (the spawned workers could not receive them)
+            workers = 0
+    if workers == 0:
+        for task in tasks:
+            collect(*_ensemble_chunk(task))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            # only a few chunks are in flight, results are collected in order
+            in_flight = 2 * workers
+            futures = [pool.submit(_ensemble_chunk, t) for t in tasks[:in_flight]]
+            for k in range(len(tasks)):
+                BGP, MP = futures[k].result()
+                futures[k] = None
+                if k + in_flight < len(tasks):
+                    futures.append(pool.submit(_ensemble_chunk, tasks[k + in_flight]))
+                collect(BGP, MP)
+
+    estimate = estimator.result()
+    mean = total / max(n_draws, 1)
+    return EnsembleResult(
+        quantiles=np.asarray(quantiles, dtype=float),
+        BGP=estimate[:, 0],
+        MP=estimate[:, 1],
+        BGP_mean=mean[0],
+        MP_mean=mean[1],
+        n_draws=n_draws,
+    )
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Fitting of the Modified Gompertz model to batch experiments.
+
+The kinetic parameters P, Rm and l of the database are determined by fitting
+Gompertz_Function to the cumulative biogas production measured in batch tests.
+All curves are fitted at once: a Levenberg-Marquardt iteration with the
+analytic Jacobian, where every curve has its own damping and the 3x3 normal
+equations of all curves are solved together.
+
+Curves may have different numbers of measurements: t and y are arrays of
+shape (curves x points), padded with NaN.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from kinetics import Gompertz_Function
+from substrates import read_database
+
+DATABASE_COLUMNS = ["Short", "WC", "VS", "P", "Rm", "l", "C", "N", "methane"]
+
+
+def gompertz_jacobian(t, P, Rm, l):
+    """
+    Derivatives of Gompertz_Function with respect to P, Rm and l
+    (shape of t x 3). P, Rm, l are column vectors (curves x 1).
+    """
+    a = ((Rm * np.e) / P) * (l - t) + 1
+    E = np.exp(a)
+    G = np.exp(-E)
+    dP = G * (1 + E * (a - 1))
+    dRm = -G * E * np.e * (l - t)
+    dl = -G * E * Rm * np.e
+    return np.stack([dP, dRm, dl], axis=-1)
+
+
+def initial_guess(t, y):
+    """
+    Start values from the data: P slightly above the highest production,
+    Rm the steepest slope and l the intercept of that tangent with y = 0.
+    """
+    y_max = np.nanmax(y, axis=1)
+    slope = np.diff(y, axis=1) / np.diff(t, axis=1)
+    slope = np.where(np.isfinite(slope), slope, -np.inf)
+    k = np.argmax(slope, axis=1)
+    rows = np.arange(len(t))
+    Rm = np.maximum(slope[rows, k], 1e-6 * np.maximum(y_max, 1))
+    # tangent through the midpoint of the steepest interval
+    t_mid = (t[rows, k] + t[rows, k + 1]) / 2
+    y_mid = (y[rows, k] + y[rows, k + 1]) / 2
+    l = np.maximum(t_mid - y_mid / Rm, 0)
+    return np.stack([1.05 * y_max, Rm, l], axis=1)
+
+
+def fit_gompertz(t, y, conf=0.95, max_iter=200, tol=1e-10, start=None):
+    """
+    Fit the Modified Gompertz model to many batch curves at once.
+
+    t: time (d), y: cumulative biogas production (L/kgVS), both (curves x points),
+    padded with NaN. start: optional start values (curves x 3).
+
+    Returns a DataFrame with one row per curve: P, Rm, l, the half widths of
+    their confidence intervals (P_ci, Rm_ci, l_ci), rmse, r2, the number of
+    points and whether the iteration converged.
+    """
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    t = np.broadcast_to(t, y.shape)
+    valid = np.isfinite(t) & np.isfinite(y)
+    n_points = valid.sum(axis=1)
+    if np.any(n_points < 4):
+        raise ValueError("every curve needs at least 4 measurements")
+    t0 = np.where(valid, t, 0.0)
+    y0 = np.where(valid, y, 0.0)
+
+    theta = initial_guess(t, y) if start is None else np.array(start, dtype=float)
+
+    def residuals(theta):
+        P, Rm, l = (theta[:, [i]] for i in range(3))
+        with np.errstate(over="ignore", invalid="ignore"):
+            r = np.where(valid, y0 - Gompertz_Function(t0, P, Rm, l), 0.0)
+        return r, np.sum(r**2, axis=1)
+
+    r, ssr = residuals(theta)
+    lam = np.full(len(theta), 1e-3)
+    converged = np.zeros(len(theta), dtype=bool)
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        P, Rm, l = (theta[active][:, [i]] for i in range(3))
+        J = gompertz_jacobian(t0[active], P, Rm, l) * valid[active][..., None]
+        JTJ = np.einsum("npi,npj->nij", J, J)
+        JTr = np.einsum("npi,np->ni", J, r[active])
+        # damped normal equations, scaled with the diagonal (Marquardt)
+        diag = np.einsum("nii->ni", JTJ)
+        # (a tiny ridge keeps A regular for flat curves)
+        A = JTJ + (lam[active][:, None, None] * diag[:, :, None] + 1e-12) * np.eye(3)
+        step = np.linalg.solve(A, JTr[..., None])[..., 0]
+        trial = theta.copy()
+        trial[active] += step
+        r_trial, ssr_trial = residuals(trial)
+        # P and Rm have to stay positive
+        better = (
+            active
+            & np.isfinite(ssr_trial)
+            & (ssr_trial <= ssr)
+            & (trial[:, 0] > 0)
+            & (trial[:, 1] > 0)
+        )
+        small_change = np.abs(ssr - ssr_trial) <= tol * np.maximum(ssr, 1e-300)
+        theta[better] = trial[better]
+        r[better] = r_trial[better]
+        converged |= better & small_change
+        ssr[better] = ssr_trial[better]
+        lam = np.where(better, lam / 10, np.where(active, lam * 10, lam))
+        # damping can not grow any further: the minimum is reached
+        converged |= active & (lam > 1e12)
+
+    # confidence intervals from the linearised covariance s^2 (J^T J)^-1
+    P, Rm, l = (theta[:, [i]] for i in range(3))
+    J = gompertz_jacobian(t0, P, Rm, l) * valid[..., None]
+    JTJ = np.einsum("npi,npj->nij", J, J)
+    dof = np.maximum(n_points - 3, 1)
+    s2 = ssr / dof
+    with np.errstate(invalid="ignore"):
+        cov = np.linalg.pinv(JTJ) * s2[:, None, None]
+        ci = stats.t.ppf(0.5 + conf / 2, dof)[:, None] * np.sqrt(
+            np.einsum("nii->ni", cov)
+        )
+    y_mean = np.nanmean(np.where(valid, y, np.nan), axis=1)
+    sst = np.sum(np.where(valid, y - y_mean[:, None], 0.0) ** 2, axis=1)
+
+    return pd.DataFrame(
+        {
+            "P": theta[:, 0],
+            "Rm": theta[:, 1],
+            "l": theta[:, 2],
+            "P_ci": ci[:, 0],
+            "Rm_ci": ci[:, 1],
+            "l_ci": ci[:, 2],
+            "rmse": np.sqrt(ssr / n_points),
+            "r2": 1 - ssr / sst,
+            "n_points": n_points,
+            "converged": converged,
+        }
+    )
+
+
+def batch_table_to_arrays(table, id_col="Short", t_col="t", y_col="y"):
+    """
+    Long table of batch measurements (one row per measurement) to padded
+    arrays. Returns the curve ids, t and y (curves x points).
+    """
+    table = table.sort_values([id_col, t_col])
+    ids, inverse = np.unique(table[id_col].to_numpy(), return_inverse=True)
+    position = table.groupby(id_col).cumcount().to_numpy()
+    t = np.full([len(ids), position.max() + 1], np.nan)
+    y = np.full_like(t, np.nan)
+    t[inverse, position] = table[t_col].to_numpy(dtype=float)
+    y[inverse, position] = table[y_col].to_numpy(dtype=float)
+    return ids, t, y
+
+
+def fit_batch_table(table, id_col="Short", t_col="t", y_col="y", conf=0.95):
+    """Fit every curve of a long table of batch measurements, indexed by id."""
+    ids, t, y = batch_table_to_arrays(table, id_col, t_col, y_col)
+    fit = fit_gompertz(t, y, conf=conf)
+    fit.insert(0, id_col, ids)
+    return fit
+
+
+def database_rows(fit, composition):
+    """
+    Rows in the format of Database_CoAgrowPlus.csv: the fitted kinetic
+    parameters joined with the composition of the substrates
+    (DataFrame with the columns Short, WC, VS, C, N, methane).
+    """
+    rows = composition.merge(fit[["Short", "P", "Rm", "l"]], on="Short", how="inner")
+    return rows[DATABASE_COLUMNS]
+
+
+def write_database(rows, path, append=True):
+    """
+    Write database rows to a ;-separated file (the format read by the model).
+    With append=True, substrates already in the file are replaced.
+    """
+    rows = rows[DATABASE_COLUMNS]
+    if append:
+        try:
+            old = read_database(path)
+            old = old[~old["Short"].isin(rows["Short"])]
+            rows = pd.concat([old[DATABASE_COLUMNS], rows], ignore_index=True)
+        except FileNotFoundError:
+            pass
+    rows.to_csv(path, sep=";", index=False)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Fleet simulation: many digesters of a plant in one vectorized pass.
+
+The fleet is a table with one row per feed segment of every digester:
+
+    digester | VF | start | HRT | BR | shares (dict)  or  one column per substrate
+
+The segments of all digesters are processed like the segments of a single
+schedule (one share matrix, one call of segment_production) and summed per
+digester afterwards, so the substrate kinetics are evaluated once for the
+whole fleet and shared through the curve cache.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from kinetics import curve_cache
+from production import segment_production
+from scenarios import scenario_shares
+from schedule import mix_characteristics, mix_checks
+from substrates import as_registry
+
+FLEET_COLUMNS = ["digester", "VF", "start", "HRT", "BR"]
+
+
+@dataclass
+class FleetResult:
+    digesters: list  # names of the digesters, in the order of the rows below
+    mix: pd.DataFrame  # characteristics and checks, one row per segment
+    biogas: np.ndarray  # daily biogas production (digesters x tm, L/d)
+    methane: np.ndarray  # daily methane production (digesters x tm, L/d)
+
+    @property
+    def plant_biogas(self):
+        return self.biogas.sum(axis=0)
+
+    @property
+    def plant_methane(self):
+        return self.methane.sum(axis=0)
+
+    def series(self, digester):
+        """Daily biogas and methane production of one digester."""
+        k = self.digesters.index(digester)
+        return self.biogas[k], self.methane[k]
+
+    def to_frame(self, gas="biogas"):
+        """Daily production of every digester and the plant (columns)."""
+        values = self.biogas if gas == "biogas" else self.methane
+        frame = pd.DataFrame(values.T, columns=[str(d) for d in self.digesters])
+        frame.insert(0, "day", range(values.shape[1]))
+        frame[f"{gas}total"] = values.sum(axis=0)
+        return frame
+
+
+def fleet_table(digesters):
+    """
+    Fleet table of {digester name: (VF, FeedSchedule)}, one row per segment
+    with the shares as dict.
+    """
+    rows = [
+        (name, VF, s.start, s.HRT, s.BR, s.shares)
+        for name, (VF, schedule) in digesters.items()
+        for s in schedule
+    ]
+    return pd.DataFrame(rows, columns=FLEET_COLUMNS + ["shares"])
+
+
+def run_fleet(data, fleet, tm):
+    """
+    Evaluate all digesters of a fleet table over tm days.
+
+    data: SubstrateRegistry or substrate database DataFrame
+    fleet: table with the columns digester, VF, start, HRT, BR and either a
+        column shares ({short name: share}) or one share column per substrate
+
+    Returns a FleetResult with the production of every digester and of the
+    plant.
+    """
+    missing = set(FLEET_COLUMNS) - set(fleet.columns)
+    if missing:
+        raise KeyError(f"fleet table is missing the columns {sorted(missing)}")
+    registry = as_registry(data)
+    data = registry.data
+
+    # segments of a digester have to be contiguous and ordered by start day
+    codes, digesters = pd.factorize(fleet["digester"])
+    order = np.lexsort((fleet["start"].to_numpy(), codes))
+    fleet = fleet.iloc[order].reset_index(drop=True)
+    codes = codes[order]
+    if "shares" in fleet.columns:
+        shares = registry.share_matrix(list(fleet["shares"]))
+    else:
+        share_columns = fleet.columns.difference(FLEET_COLUMNS, sort=False)
+        shares = scenario_shares(data, fleet[share_columns])
+
+    starts = fleet["start"].to_numpy(dtype=int)
+    HRT = fleet["HRT"].to_numpy(dtype=int)
+    if np.any(HRT < 1):
+        raise ValueError("HRT must be at least one day")
+    # a segment is fed until the next segment of the same digester starts
+    last = np.append(codes[1:] != codes[:-1], True)
+    stops = np.where(last, tm, np.roll(starts, -1))
+
+    VF = fleet["VF"].to_numpy(dtype=float)
+    mix = mix_characteristics(data, shares, VF, HRT, fleet["BR"])
+    mix.insert(0, "digester", fleet["digester"])
+    mix.insert(1, "VF", VF)
+    mix.insert(2, "start", starts)
+    mix.insert(3, "stop", np.minimum(stops, tm))
+    mix = mix.join(mix_checks(mix))
+
+    BGP_substrates = curve_cache.curves(data["P"], data["Rm"], data["l"], HRT.max())
+    VS_feed = (mix["Feed"] * mix["VS"]).to_numpy()  # (kgVS/d)
+    BGP = segment_production(
+        shares @ BGP_substrates, HRT, starts, mix["stop"], VS_feed, tm
+    )
+    MP = BGP * mix["methane"].to_numpy()[:, None]
+
+    # sum of the segments of every digester
+    first = np.flatnonzero(np.append(True, codes[1:] != codes[:-1]))
+    biogas = np.add.reduceat(BGP, first, axis=0)
+    methane = np.add.reduceat(MP, first, axis=0)
+    return FleetResult(list(digesters[codes[first]]), mix, biogas, methane)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental recomputation of the continuous biogas model.
+
+The model is a chain of cached stages, each keyed on its inputs and the keys
+of the stages above it:
+
+    substrate table  (database file, re-read if it changes)
+      -> mix kinetics        per (shares, HRT): production per kgVS
+      -> mix characteristics per (shares, HRT, BR, VF)
+      -> segment production  per (kinetics, characteristics, start, stop, tm)
+      -> reactor total
+
+Changing one input only recomputes the stages below it: new shares of Mix 3
+recompute its kinetics and production, a new start day of Mix 3 recomputes
+the production of Mix 2 (its stop day) and Mix 3, and the total is summed
+again. Unchanged segments, also ones that were computed before an undo, are
+taken from the cache.
+
+    model = IncrementalModel(config)
+    model.result()
+    model.update_segment(2, shares={"Sample1": 0.5, "Sample3": 0.5})
+    model.result()  # only Mix 3 is recomputed
+"""
+
+from collections import OrderedDict
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from kinetics import curve_cache
+from model import ModelResult, load_substrates
+from production import segment_production
+from schedule import FeedSchedule, mix_characteristics, mix_checks
+from substrates import as_registry
+
+
+class _Memo:
+    """Bounded least-recently-used memo of one stage."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.computed = 0
+        self.reused = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, compute):
+        value = self._entries.get(key)
+        if value is not None:
+            self.reused += 1
+            self._entries.move_to_end(key)
+            return value
+        value = compute()
+        self.computed += 1
+        self._entries[key] = value
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+class IncrementalModel:
+    """Continuous biogas model that recomputes only the changed stages."""
+
+    STAGES = ("kinetics", "characteristics", "production")
+
+    def __init__(self, config, max_entries=1024):
+        self.config = config
+        self._registry = None
+        self._memos = {name: _Memo(max_entries) for name in self.STAGES}
+
+    # inputs
+
+    def update(self, **changes):
+        """Change VF, tm, database or the whole schedule (ModelConfig fields)."""
+        self.config = replace(self.config, **changes)
+        return self
+
+    def update_segment(self, k, **changes):
+        """Change start, shares, HRT or BR of the k-th segment (0 = Mix 1)."""
+        segments = list(self.config.schedule)
+        segments[k] = replace(segments[k], **changes)
+        return self.update(schedule=FeedSchedule(segments))
+
+    # stages
+
+    def substrates(self):
+        """Substrate table; all cached stages are dropped if it changed."""
+        database = self.config.database
+        if isinstance(database, str):
+            registry = load_substrates(database)
+        else:
+            registry = as_registry(database)
+        if registry is not self._registry:
+            for memo in self._memos.values():
+                memo.clear()
+            self._registry = registry
+        return registry
+
+    def kinetics(self, shares, HRT):
+        """Cumulative production per kgVS of a mix on the days 0...HRT."""
+        registry = self._registry
+        key = (tuple(sorted(shares.items())), HRT)
+
+        def compute():
+            share_vector = registry.share_vector(shares)
+            used = np.flatnonzero(share_vector)
+            data = registry.data.iloc[used]
+            curves = curve_cache.curves(data["P"], data["Rm"], data["l"], HRT)
+            return share_vector, share_vector[used] @ curves
+
+        return key, self._memos["kinetics"].get(key, compute)
+
+    def characteristics(self, kinetics_key, share_vector, HRT, BR, VF):
+        """Mix characteristics (one row of mix_characteristics)."""
+        key = (kinetics_key, BR, VF)
+
+        def compute():
+            return mix_characteristics(
+                self._registry.data, share_vector[None, :], VF, [HRT], [BR]
+            ).iloc[0]
+
+        return key, self._memos["characteristics"].get(key, compute)
+
+    def production(self, key, BGP_perkgVS, mix, HRT, start, stop, tm):
+        """Daily biogas production of one segment (tm days)."""
+
+        def compute():
+            VS_feed = mix["Feed"] * mix["VS"]  # (kgVS/d)
+            BGP = segment_production(
+                BGP_perkgVS[None, :], [HRT], [start], [stop], [VS_feed], tm
+            )[0]
+            BGP.flags.writeable = False
+            return BGP
+
+        return self._memos["production"].get(key, compute)
+
+    def result(self):
+        """ModelResult of the current inputs."""
+        config = self.config
+        schedule, tm, VF = config.schedule, config.tm, float(config.VF)
+        if len(schedule) == 0:
+            raise ValueError("the feed schedule has no segments")
+        self.substrates()
+        stops = np.minimum(schedule.stops(tm), tm)
+        rows, BGP_Mix = [], np.empty([len(schedule), tm])
+        with stage("mix production"):
+            for k, (segment, stop) in enumerate(zip(schedule, stops)):
+                HRT, BR = segment.HRT, segment.BR
+                kinetics_key, (share_vector, BGP_perkgVS) = self.kinetics(
+                    segment.shares, HRT
+                )
+                mix_key, mix = self.characteristics(
+                    kinetics_key, share_vector, HRT, BR, VF
+                )
+                key = (mix_key, segment.start, int(stop), tm)
+                BGP_Mix[k] = self.production(
+                    key, BGP_perkgVS, mix, HRT, segment.start, int(stop), tm
+                )
+                rows.append(mix)
+        with stage("mix checks"):
+            mix = pd.DataFrame(rows).reset_index(drop=True)
+            mix.insert(0, "start", schedule.starts)
+            mix.insert(1, "stop", stops)
+            last_day = np.clip(stops - 1, 0, tm - 1)
+            mix["BGP_last_day"] = BGP_Mix[np.arange(len(mix)), last_day]
+            mix = mix.join(mix_checks(mix))
+        MP_Mix = BGP_Mix * mix["methane"].to_numpy()[:, None]
+        return ModelResult(config, mix, BGP_Mix, MP_Mix)
+
+    def stats(self):
+        """Computed and reused entries of every stage."""
+        return {
+            name: {"computed": memo.computed, "reused": memo.reused}
+            for name, memo in self._memos.items()
+        }
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Optional timing and memory instrumentation of the model stages.
+
+The model functions mark their stages with `stage(name)`. As long as no
+Instrumentation is active, stage() returns a shared no-op context, so the
+instrumentation costs one global lookup per stage when it is switched off.
+
+    with Instrumentation() as inst:
+        result = run_model(config)
+        result.save_csv(path)
+    inst.to_json("output/stages.json")  # or inst.stats
+
+Every stage records its call count, wall time and peak memory (tracemalloc,
+numpy allocations included, measured above the memory in use when the stage
+starts). A callback f(name, seconds, peak_bytes) is called after every stage.
+"""
+
+import contextlib
+import json
+import time
+import tracemalloc
+
+STAGES = (
+    "input data",
+    "input processing",
+    "mix production",
+    "mix checks",
+    "reactor sum",
+    "saving",
+    "plotting",
+)
+
+_active = None
+_NULL = contextlib.nullcontext()
+
+
+def stage(name):
+    """Context of a model stage, recorded by the active Instrumentation."""
+    if _active is None:
+        return _NULL
+    return _Stage(_active, name)
+
+
+class _Stage:
+    __slots__ = ("inst", "name", "start", "start_memory", "peak")
+
+    def __init__(self, inst, name):
+        self.inst = inst
+        self.name = name
+
+    def __enter__(self):
+        inst = self.inst
+        if inst.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # the peak so far belongs to the enclosing stages
+            for outer in inst._stack:
+                outer.peak = max(outer.peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = self.peak = current
+        inst._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        inst = self.inst
+        inst._stack.pop()
+        peak = 0
+        if inst.memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            for outer in inst._stack:
+                outer.peak = max(outer.peak, self.peak)
+            peak = self.peak - self.start_memory
+        inst._record(self.name, seconds, peak)
+
+
+class Instrumentation:
+    """
+    Recorder of the model stages, active inside its `with` block.
+
+    memory: record the peak memory of every stage (tracemalloc slows numpy
+        allocations down, use memory=False for timings only)
+    callback: optional f(name, seconds, peak_bytes), called after every stage
+    """
+
+    def __init__(self, memory=True, callback=None):
+        self.memory = memory
+        self.callback = callback
+        self.stats = {}  # {stage: {"calls", "time", "peak_mib"}}
+        self._stack = []
+        self._previous = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        _active = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _record(self, name, seconds, peak):
+        entry = self.stats.setdefault(name, {"calls": 0, "time": 0.0, "peak_mib": 0.0})
+        entry["calls"] += 1
+        entry["time"] += seconds
+        entry["peak_mib"] = max(entry["peak_mib"], peak / 2**20)
+        if self.callback is not None:
+            self.callback(name, seconds, peak)
+
+    def to_dict(self):
+        return {name: dict(entry) for name, entry in self.stats.items()}
+
+    def to_json(self, path=None):
+        """Stage statistics as JSON string, written to path if given."""
+        text = json.dumps(self.to_dict(), indent=1)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def report(self):
+        """Stage statistics as text table."""
+        lines = [f"{'stage':18s} {'calls':>6s} {'time (ms)':>10s} {'peak (MiB)':>11s}"]
+        for name, entry in self.stats.items():
+            lines.append(
+                f"{name:18s} {entry['calls']:6d} {entry['time']*1000:10.2f} "
+                f"{entry['peak_mib']:11.2f}"
+            )
+        return "\n".join(lines)
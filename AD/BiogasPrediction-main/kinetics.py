@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Degradation kinetics of the substrates (Modified Gompertz model).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Gompertz-Function for the estimation of biogas production
+def Gompertz_Function(t, P, Rm, l):
+    return P * np.exp(-1 * np.exp(((Rm * np.e) / P) * (l - t) + 1))
+
+
+def gompertz_curves(t, P, Rm, l):
+    """
+    Cumulative biogas production of several substrates at once.
+
+    t: time points (d), P, Rm, l: kinetic parameters, one per substrate.
+    Returns an array of shape (len(P), len(t)) in L/kgVS.
+    """
+    t = np.asarray(t, dtype=float)
+    P = np.asarray(P, dtype=float)[:, None]
+    Rm = np.asarray(Rm, dtype=float)[:, None]
+    l = np.asarray(l, dtype=float)[:, None]
+    return Gompertz_Function(t[None, :], P, Rm, l)
+
+
+class GompertzCache:
+    """
+    Memoized Gompertz curves with least-recently-used eviction.
+
+    A curve is keyed on its kinetic parameters (P, Rm, l) and evaluated on the
+    days 0...horizon. Only the longest curve of every parameter set is kept:
+    shorter horizons are read-only views of it and longer horizons extend it
+    by the missing days only. max_bytes caps the memory of all cached curves.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0  # curve was long enough
+        self.extensions = 0  # a shorter curve was extended
+        self.misses = 0  # curve was computed from scratch
+        self.evictions = 0
+        self._curves = OrderedDict()
+        self._lock = threading.Lock()
+
+    def curve(self, P, Rm, l, horizon):
+        """Cumulative production per kgVS on the days 0...horizon (read-only)."""
+        key = (float(P), float(Rm), float(l))
+        n = int(horizon) + 1
+        with self._lock:
+            cached = self._curves.get(key)
+            if cached is not None and len(cached) >= n:
+                self.hits += 1
+                self._curves.move_to_end(key)
+                return cached[:n]
+        # evaluate only the days that are not cached yet (outside of the lock)
+        m = 0 if cached is None else len(cached)
+        tail = Gompertz_Function(np.arange(m, n, dtype=float), *key)
+        values = tail if cached is None else np.concatenate([cached, tail])
+        values.flags.writeable = False
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.extensions += 1
+            self._store(key, values)
+        return values
+
+    def curves(self, P, Rm, l, horizon):
+        """Curves of several substrates (substrates x horizon+1), e.g. data["P"]."""
+        P, Rm, l = (np.asarray(x, dtype=float) for x in (P, Rm, l))
+        n = int(horizon) + 1
+        out = np.empty([len(P), n])
+        keys = list(zip(P.tolist(), Rm.tolist(), l.tolist()))
+        missing, prefixes = [], []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._curves.get(key)
+                if cached is not None and len(cached) >= n:
+                    self.hits += 1
+                    self._curves.move_to_end(key)
+                    out[i] = cached[:n]
+                else:
+                    missing.append(i)
+                    prefixes.append(cached)
+        if not missing:
+            return out
+        # the days all missing (or too short) curves have in common are copied,
+        # the rest is evaluated in one vectorized call
+        m = min(0 if c is None else len(c) for c in prefixes)
+        if m:
+            for i, cached in zip(missing, prefixes):
+                out[i, :m] = cached[:m]
+        out[missing, m:] = gompertz_curves(
+            np.arange(m, n), P[missing], Rm[missing], l[missing]
+        )
+        with self._lock:
+            for i, cached in zip(missing, prefixes):
+                if cached is not None:
+                    self.extensions += 1
+                else:
+                    self.misses += 1
+                values = out[i].copy()
+                values.flags.writeable = False
+                self._store(keys[i], values)
+        return out
+
+    def _store(self, key, values):
+        old = self._curves.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        if values.nbytes > self.max_bytes:
+            return  # larger than the whole cache, not stored
+        self._curves[key] = values
+        self.nbytes += values.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._curves.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._curves.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Counters of the cache as dict."""
+        return {
+            "curves": len(self._curves),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "extensions": self.extensions,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# cache shared by the model functions
+curve_cache = GompertzCache()
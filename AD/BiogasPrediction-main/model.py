@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Importable API of the continuous biogas model.
+
+    from model import ModelConfig, run_model
+
+    result = run_model(ModelConfig(VF=700, tm=200, schedule=schedule))
+    result.to_frame()  # daily production of every mix and of the reactor
+    result.diagnostics()  # check-up report as a table
+
+Nothing is computed, printed or written at import time; matplotlib is only
+imported when a plot is requested. The substrate database is kept in memory
+after the first run (and re-read only when the file changes).
+"""
+
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from results import save_results
+from schedule import (
+    BR_MAX,
+    BR_MIN,
+    CN_MAX,
+    CN_MIN,
+    WC_MASHED_MIN,
+    FeedSchedule,
+    mix_checks,
+    run_schedule,
+)
+from substrates import SubstrateRegistry, as_registry
+
+DEFAULT_DATABASE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "Database_CoAgrowPlus.csv"
+)
+
+_registries = {}  # {path: (mtime, SubstrateRegistry)}
+
+
+def load_substrates(path=DEFAULT_DATABASE):
+    """SubstrateRegistry of a database file, kept in memory between runs."""
+    with stage("input data"):
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        cached = _registries.get(path)
+        if cached is None or cached[0] != mtime:
+            registry = SubstrateRegistry.from_file(path)
+            # add columns with dry mass to data set
+            registry.data["DM"] = 1 - registry.data["WC"]
+            cached = _registries[path] = (mtime, registry)
+        return cached[1]
+
+
+@dataclass
+class ModelConfig:
+    VF: float  # volume of fermenter (m^3)
+    tm: int  # time span for which the biogas production is projected (d)
+    schedule: FeedSchedule = field(default_factory=FeedSchedule)
+    # path of the substrate database, or a SubstrateRegistry / DataFrame
+    database: object = DEFAULT_DATABASE
+
+
+@dataclass
+class ModelResult:
+    config: ModelConfig
+    mix: pd.DataFrame  # characteristics and checks, one row per mix
+    BGP_Mix: np.ndarray  # daily biogas production of every mix (mixes x tm, L/d)
+    MP_Mix: np.ndarray  # daily methane production of every mix (mixes x tm, L/d)
+
+    @property
+    def BGP_total(self):
+        with stage("reactor sum"):
+            return self.BGP_Mix.sum(axis=0)
+
+    @property
+    def MP_total(self):
+        with stage("reactor sum"):
+            return self.MP_Mix.sum(axis=0)
+
+    def to_frame(self):
+        """Daily production (the columns of output/outputdata_conti.csv)."""
+        columns = {"day": range(self.config.tm)}
+        for k in range(len(self.mix)):
+            columns[f"biogasMix{k+1}"] = self.BGP_Mix[k]
+        columns["biogastotal"] = self.BGP_total
+        return pd.DataFrame(columns)
+
+    def save_csv(self, path):
+        with stage("saving"):
+            self.to_frame().to_csv(path, index=False, header=True, sep=";")
+
+    def save(self, path, dtype="float64"):
+        """
+        Binary result store (see results.py) with the rows biogasMix1, ...,
+        biogastotal and methaneMix1, ..., methanetotal.
+        """
+        n = len(self.mix)
+        names = [f"biogasMix{k+1}" for k in range(n)] + ["biogastotal"]
+        names += [f"methaneMix{k+1}" for k in range(n)] + ["methanetotal"]
+        values = np.vstack([self.BGP_Mix, self.BGP_total, self.MP_Mix, self.MP_total])
+        attrs = {"VF": float(self.config.VF), "tm": int(self.config.tm)}
+        with stage("saving"):
+            save_results(path, values, names, dtype=dtype, attrs=attrs)
+
+    def diagnostics(self):
+        """
+        Check-up report as a table: one row per mix and item with its value,
+        ok (True / False for checks, None for information) and the message.
+        """
+        with stage("mix checks"):
+            rows = []
+            for k in range(len(self.mix)):
+                rows += _mix_diagnostics(k + 1, self.mix.iloc[k])
+            return pd.DataFrame(rows, columns=["mix", "item", "value", "ok", "message"])
+
+    def input_summary(self):
+        """Summary of the model input (text)."""
+        schedule = self.config.schedule
+        lines = [
+            "\nThe biogas production is modeled for:\n a fermenter with a volume of "
+            + (f"{(self.config.VF)}")
+            + " m^3,"
+            + "\n a hydraulic retention time of "
+            + (f"{(schedule.segments[0].HRT)}")
+            + " days,"
+            "\n a time span of " + (f"{(self.config.tm)}") + " days, and"
+            "\n a substrate change after "
+            + ", ".join(f"{(s.start)}" for s in schedule.segments[1:])
+            + " days."
+            "\n The organic loading rate is set to "
+            + (f"{(schedule.segments[0].BR)}")
+            + " kgVS/m^3/d."
+        ]
+        for k, segment in enumerate(schedule):
+            lines.append(f"The following Substrates are used in Mix {k+1}:")
+            for name, share in segment.shares.items():
+                lines.append(" " f"{(share)*100}" + " % " + name)
+        return "\n".join(lines)
+
+    def report(self):
+        """Check-up report of all mixes (text)."""
+        lines = []
+        for mix, messages in self.diagnostics().groupby("mix", sort=True)["message"]:
+            lines += [f"\nMix {mix}", ""] + [m for m in messages if m]
+        return "\n".join(lines)
+
+    def plot(self, path=None, dpi=300):
+        """
+        Plot of the daily biogas production of every mix and the sum. Saved to
+        path if given, otherwise the figure is returned.
+        """
+        with stage("plotting"):
+            return self._plot(path, dpi)
+
+    def _plot(self, path, dpi):
+        from matplotlib import pyplot as plt
+
+        tm = self.config.tm
+        # Mix1, Mix2, ..., Mix_total
+        colors = ["black", "darkblue", "blue", "green"]
+        fig = plt.figure()
+        for k in range(len(self.mix)):
+            color = colors[k] if k < len(colors) else None
+            plt.plot(range(tm), self.BGP_Mix[k], c=color, lw=0.75, label=f"Mix {k+1}")
+        plt.plot(range(tm), self.BGP_total, "r--", lw=0.75, label="Sum")
+        plt.title("daily biogas production")
+        plt.xlabel("time (d)")
+        plt.ylabel("biogas production $(L_N/d)$")
+        plt.legend(loc="upper left")
+        if path is None:
+            return fig
+        fig.savefig(path, dpi=dpi, bbox_inches="tight")
+        plt.close(fig)
+
+
+def run_model(config):
+    """Run the continuous biogas model for a configuration."""
+    if isinstance(config.database, str):
+        substrates = load_substrates(config.database)
+    else:
+        substrates = as_registry(config.database)
+    mix, BGP_Mix = run_schedule(substrates, config.schedule, config.VF, config.tm)
+    with stage("mix checks"):
+        mix = mix.join(mix_checks(mix))
+    with stage("mix production"):
+        # Methane production with regards to Substrate Input
+        MP_Mix = BGP_Mix * mix["methane"].to_numpy()[:, None]
+    return ModelResult(config, mix, BGP_Mix, MP_Mix)
+
+
+def _mix_diagnostics(k, m):
+    """Check-up of the k-th mix (row m of the mix characteristics)."""
+    rows = []
+
+    def add(item, value, ok, message):
+        rows.append((k, item, value, ok, message))
+
+    # Input Check
+    if m["Share_ok"]:
+        add("shares", m["Share_sum"], True, f"\N{CHECK MARK} Input {k} is correct.")
+    elif m["Share_sum"] < 1:
+        add("shares", m["Share_sum"], False, f"✘ Input {k} is too low.")
+    else:
+        add("shares", m["Share_sum"], False, f"✘ Input {k} is too high.")
+
+    # check input for Loading Rate per Unit Volume (BR)
+    if m["BR"] > BR_MAX:
+        message = (
+            "✘ The Loading Rate per Unit Volume is too high. A longer Hydraulic "
+            "Retention Time is needed."
+        )
+    elif m["BR"] < BR_MIN:
+        message = (
+            "✘ The Loading Rate per Unit Volume is very low. Consider shorter "
+            "Hydraulic Retention Time."
+        )
+    else:
+        message = (
+            "\N{CHECK MARK} The Loading Rate per Unit Volume of "
+            + (f"{(m['BR']):.2f}")
+            + " lies in the optimum range."
+        )
+    add("BR", m["BR"], bool(m["BR_ok"]), message)
+
+    # check input for Carbon to Nitrogen Ratio
+    if m["CN"] < CN_MIN:
+        message = "✘ C/N - Ratio " + "(" + (f"{(m['CN']):.2f}") + ") is too low"
+    elif m["CN"] > CN_MAX:
+        message = "✘ C/N - Ratio " + "(" + (f"{(m['CN']):.2f}") + ") is too high"
+    else:
+        message = (
+            "\N{CHECK MARK} C/N - Ratio "
+            + "("
+            + (f"{(m['CN']):.2f}")
+            + ") is in the optimum range"
+        )
+    add("CN", m["CN"], bool(m["CN_ok"]), message)
+
+    # amount of fresh substrate to be fed to the reator per day
+    small = m["Feed"] < 0.1
+    if small:
+        message = (
+            "The amount of substrate to be fed daily is "
+            + (f"{(m['Feed']*1000):.2f}")
+            + " g FM."
+        )
+    else:
+        message = (
+            "The amount of substrate to be fed daily is "
+            + (f"{(m['Feed']):.2f}")
+            + " kg FM."
+        )
+    add("Feed", m["Feed"], None, message)
+
+    # Need for additional water
+    if small:
+        message = (
+            "You have to add "
+            + (f"{(m['add_water_perday'])*1000:.2f}")
+            + " mL water to substrate mix initially."
+        )
+    elif m["add_water"] <= 0:
+        message = "No additional water is needed!"
+    else:
+        message = (
+            "You have to add "
+            + (f"{(m['add_water']):.2f}")
+            + " kg water per kg substrate mix initially."
+        )
+    add("add_water", m["add_water"], None, message)
+
+    # Water content for wet fermentation needs to be 0.88 or higher
+    if m["WC_Mashed"] < WC_MASHED_MIN:
+        message = (
+            "✘ Water content of the mashed substrate is too low. You have to "
+            "decrease the loading rate per unit volume"
+        )
+    else:
+        message = (
+            "\N{CHECK MARK} Water content of the mashed substrate of "
+            + (f"{(m['WC_Mashed']*100):.2f}")
+            + " % lies in the optimum range."
+        )
+    add("WC_Mashed", m["WC_Mashed"], bool(m["WC_Mashed_ok"]), message)
+
+    # Water Recovery, pressing down to 50% water content
+    if small:
+        message = (
+            (f"{(m['water_recovery_perday']*1000):.2f}")
+            + " mL water can be recovered per day."
+        )
+    else:
+        message = (
+            (f"{(m['water_recovery']):.2f}")
+            + " kg water can be recovered per kg FM used."
+        )
+    add("water_recovery", m["water_recovery"], None, message)
+
+    # Additional water need
+    message = ""
+    if m["add_water_need"] > 0:
+        if small:
+            message = (
+                "Each day, an amount of "
+                + (f"{(m['add_water_need']*1000):.2f}")
+                + " g water must be supplied externally."
+            )
+        else:
+            message = (
+                "Each day, an amount of "
+                + (f"{(m['add_water_need']):.2f}")
+                + " kg water must be supplied externally."
+            )
+    add("add_water_need", m["add_water_need"], None, message)
+
+    # biogas production at the last day the mix is fed
+    message = (
+        "The expected biogas production is "
+        + (f"{(m['BGP_last_day']):.2f}")
+        + " L per day"
+    )
+    add("BGP_last_day", m["BGP_last_day"], None, message)
+    return rows
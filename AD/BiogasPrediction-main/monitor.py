@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming daily forecast and inhibition monitor.
+
+The monitor ingests one day of feed and gas-meter data at a time. Every fed
+portion adds its production over the following HRT days to a ring buffer of
+outstanding contributions, so the prediction of a day costs O(HRT) and no
+history is kept. The predicted and measured production are compared with a
+rolling relative RMSE; Schultz et al. [1] suggest a rRMSE above 10% as an
+early warning of a process inhibition.
+
+Example:
+    monitor = InhibitionMonitor(substrates, window=14, on_alert=print)
+    for record in historian:
+        monitor.update_mix(record.feed_FM, record.shares, record.HRT, record.gas)
+"""
+
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+
+from kinetics import curve_cache
+from substrates import as_registry
+
+RRMSE_THRESHOLD = 0.10  # rRMSE between predicted and measured production
+
+DayResult = namedtuple("DayResult", "day predicted measured rrmse alert")
+
+
+class ProductionForecaster:
+    """Daily reactor production from a stream of fed portions."""
+
+    def __init__(self, max_HRT=100):
+        self.day = 0
+        # outstanding production (L/d) of the next days
+        self._future = np.zeros(max_HRT)
+        self._head = 0  # position of today in the ring buffer
+
+    def feed(self, VS_feed, kernel):
+        """
+        Add today's portion: VS_feed (kgVS) producing kernel[j] (L/kgVS) on
+        the j-th day after feeding (j = 0 is today).
+        """
+        kernel = np.asarray(kernel, dtype=float)
+        if len(kernel) > len(self._future):
+            self._grow(len(kernel))
+        n = len(self._future)
+        idx = (self._head + np.arange(len(kernel))) % n
+        self._future[idx] += VS_feed * kernel
+
+    def advance(self):
+        """Close the current day, returns its production (L/d)."""
+        production = self._future[self._head]
+        self._future[self._head] = 0.0
+        self._head = (self._head + 1) % len(self._future)
+        self.day += 1
+        return production
+
+    def _grow(self, size):
+        self._future = np.concatenate(
+            [np.roll(self._future, -self._head), np.zeros(size - len(self._future))]
+        )
+        self._head = 0
+
+
+class RollingRRMSE:
+    """Relative RMSE of the last `window` days, O(1) per update."""
+
+    def __init__(self, window=14):
+        self.window = window
+        self._values = deque()
+        self._sse = 0.0
+        self._sum = 0.0
+        self._updates = 0
+
+    def update(self, predicted, measured):
+        se = (predicted - measured) ** 2
+        self._values.append((se, measured))
+        self._sse += se
+        self._sum += measured
+        if len(self._values) > self.window:
+            old_se, old_measured = self._values.popleft()
+            self._sse -= old_se
+            self._sum -= old_measured
+        self._updates += 1
+        if self._updates % (100 * self.window) == 0:
+            # re-sum now and then against the drift of the running sums
+            self._sse = sum(v[0] for v in self._values)
+            self._sum = sum(v[1] for v in self._values)
+
+    @property
+    def full(self):
+        return len(self._values) >= self.window
+
+    def value(self):
+        n = len(self._values)
+        if n == 0 or self._sum <= 0:
+            return np.nan
+        return np.sqrt(max(self._sse, 0.0) / n) / (self._sum / n)
+
+
+class InhibitionMonitor:
+    """
+    Forecast of the daily biogas production from the actual feed and rolling
+    comparison with the gas meter.
+
+    substrates: SubstrateRegistry or database DataFrame
+    window: days of the rolling rRMSE (no alert before the window is full)
+    threshold: rRMSE above which an alert is raised
+    on_alert: optional callback f(DayResult), called when the rRMSE crosses
+    the threshold from below
+    max_kernels: number of mix kernels kept (least recently used are dropped)
+    """
+
+    def __init__(
+        self,
+        substrates,
+        window=14,
+        threshold=RRMSE_THRESHOLD,
+        on_alert=None,
+        max_kernels=256,
+    ):
+        self.substrates = as_registry(substrates)
+        self.forecaster = ProductionForecaster()
+        self.rrmse = RollingRRMSE(window)
+        self.threshold = threshold
+        self.on_alert = on_alert
+        self.alert = False
+        self.max_kernels = max_kernels
+        self._kernels = OrderedDict()
+        data = self.substrates.data
+        self._VS = ((1 - data["WC"]) * data["VS"]).to_numpy(dtype=float)
+
+    def kernel(self, shares, HRT):
+        """
+        VS content (% FM) and daily production per kgVS over the HRT of a
+        mix {short name: share} (cached per mix, at most max_kernels).
+        """
+        key = (tuple(sorted(shares.items())), int(HRT))
+        cached = self._kernels.get(key)
+        if cached is not None:
+            self._kernels.move_to_end(key)
+        else:
+            share_vector = self.substrates.share_vector(shares)
+            used = np.flatnonzero(share_vector)
+            data = self.substrates.data.iloc[used]
+            curves = curve_cache.curves(data["P"], data["Rm"], data["l"], HRT)
+            VS_mix = share_vector[used] @ self._VS[used]
+            cached = (VS_mix, np.diff(share_vector[used] @ curves))
+            self._kernels[key] = cached
+            if len(self._kernels) > self.max_kernels:
+                self._kernels.popitem(last=False)
+        return cached
+
+    def update_mix(self, feed_FM, shares, HRT, measured=None):
+        """
+        One day of plant data: fresh mass fed (kg FM) of a mix {short name:
+        share} with its HRT (d), and the measured biogas production (L/d,
+        None if not available).
+        """
+        VS_mix, kernel = self.kernel(shares, HRT)
+        return self.update(feed_FM * VS_mix, kernel, measured)
+
+    def update(self, VS_feed, kernel, measured=None):
+        """One day of plant data with the VS fed (kgVS) and its daily kernel."""
+        if VS_feed:
+            self.forecaster.feed(VS_feed, kernel)
+        day = self.forecaster.day
+        predicted = float(self.forecaster.advance())
+        if measured is not None and np.isfinite(measured):
+            self.rrmse.update(predicted, measured)
+        rrmse = self.rrmse.value()
+        above = self.rrmse.full and rrmse > self.threshold
+        raised = above and not self.alert
+        self.alert = bool(above)
+        result = DayResult(day, predicted, measured, rrmse, raised)
+        if raised and self.on_alert is not None:
+            self.on_alert(result)
+        return result
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Optimization of the substrate shares of a mix.
+
+All mix characteristics of the model are share-weighted averages, so the
+check-up limits become linear constraints on the shares x (sum(x) = 1):
+
+    C/N >= CN_MIN                  x . (C - CN_MIN * N) >= 0
+    C/N <= CN_MAX                  x . (C - CN_MAX * N) <= 0
+    WC_Mashed >= WC_MASHED_MIN     BR * HRT * (x . DM)
+                                       <= 1000 * (1 - WC_MASHED_MIN) * (x . VS_FM)
+    feed of substrate i <= available_i
+                                   x_i * VF * BR <= available_i * (x . VS_FM)
+
+The steady-state biogas production VF * BR * (x . Y) (Y: yield per kgVS over
+one HRT) is linear, the external water need is a ratio of linear functions
+(solved as LP with the Charnes-Cooper transformation) and the methane
+production VF * BR * (x . Y) * (x . methane) is found by a golden-section
+search over the methane content, with one LP per step.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.optimize import linprog
+
+from kinetics import curve_cache
+from schedule import (
+    BR_MAX,
+    BR_MIN,
+    CN_MAX,
+    CN_MIN,
+    WC_MASHED_MIN,
+    mix_characteristics,
+    mix_checks,
+)
+from substrates import as_registry
+
+OBJECTIVES = ("methane", "biogas", "water")
+# relative margin of the limits, so float noise of the LP solution does not
+# put the mix just outside a limit of mix_checks
+MARGIN = 1e-9
+
+
+@dataclass
+class ShareOptimum:
+    shares: dict  # {short name: share}
+    objective: str
+    value: float  # methane or biogas (L/d) or external water need (kg/d)
+    mix: object  # mix characteristics (row of mix_characteristics) and checks
+    binding: list  # names of the constraints at their limit
+    success: bool
+    message: str = ""
+
+
+def _constraints(data, idx, VF, HRT, BR, available, min_share, max_share):
+    """Homogeneous constraints A x <= 0 (valid because sum(x) = 1), with names."""
+    sub = data.iloc[idx]
+    C = sub["C"].to_numpy(dtype=float)
+    N = sub["N"].to_numpy(dtype=float)
+    DM = 1 - sub["WC"].to_numpy(dtype=float)
+    VS_FM = DM * sub["VS"].to_numpy(dtype=float)
+    names = sub["Short"].tolist()
+    ones = np.ones(len(idx))
+
+    CN_min, CN_max = CN_MIN * (1 + MARGIN), CN_MAX * (1 - MARGIN)
+    WC_min = WC_MASHED_MIN * (1 + MARGIN)
+    rows = [
+        -(C - CN_min * N),
+        C - CN_max * N,
+        BR * HRT * DM - 1000 * (1 - WC_min) * VS_FM,
+    ]
+    labels = ["CN_min", "CN_max", "WC_Mashed_min"]
+    for i, name in enumerate(names):
+        if available is not None and available.get(name) is not None:
+            row = -available[name] * (1 - MARGIN) * VS_FM
+            row[i] += VF * BR
+            rows.append(row)
+            labels.append(f"available[{name}]")
+        if max_share.get(name) is not None:
+            row = -max_share[name] * ones
+            row[i] += 1
+            rows.append(row)
+            labels.append(f"max_share[{name}]")
+        if min_share.get(name) is not None:
+            row = min_share[name] * ones
+            row[i] -= 1
+            rows.append(row)
+            labels.append(f"min_share[{name}]")
+    return np.array(rows), labels
+
+
+def _linprog(c, A_ub, A_eq, b_eq):
+    return linprog(
+        c,
+        A_ub=A_ub,
+        b_ub=np.zeros(len(A_ub)),
+        A_eq=A_eq,
+        b_eq=b_eq,
+        bounds=(0, None),
+        method="highs",
+    )
+
+
+def optimize_shares(
+    substrates,
+    inventory,
+    VF,
+    HRT,
+    BR,
+    objective="methane",
+    min_share=None,
+    max_share=None,
+    tol=1e-6,
+):
+    """
+    Shares of the substrates in `inventory` that maximize the methane or
+    biogas production, or minimize the external water need, within the
+    check-up limits of the model.
+
+    substrates: SubstrateRegistry or database DataFrame
+    inventory: short names of the available substrates, or {short name:
+        available fresh mass per day (kg FM/d) or None if unlimited}
+    VF (m^3), HRT (d), BR (kgVS/m^3/d): operating point of the fermenter
+    min_share, max_share: optional {short name: share} bounds
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective has to be one of {OBJECTIVES}")
+    if not BR_MIN <= BR <= BR_MAX:
+        raise ValueError(f"BR has to lie between {BR_MIN} and {BR_MAX} kgVS/m^3/d")
+    registry = as_registry(substrates)
+    data = registry.data
+    available = inventory if isinstance(inventory, dict) else None
+    names = list(inventory)
+    idx = registry.lookup(names)
+    A, labels = _constraints(
+        data, idx, VF, HRT, BR, available, min_share or {}, max_share or {}
+    )
+    sub = data.iloc[idx]
+    n = len(idx)
+    ones = np.ones([1, n])
+
+    # yield per kgVS over one HRT and methane content of every substrate
+    curves = curve_cache.curves(sub["P"], sub["Rm"], sub["l"], HRT)
+    Y = curves[:, -1] - curves[:, 0]
+    methane = sub["methane"].to_numpy(dtype=float)
+    VS_FM = ((1 - sub["WC"]) * sub["VS"]).to_numpy(dtype=float)
+    WC = sub["WC"].to_numpy(dtype=float)
+
+    if objective == "biogas":
+        res = _linprog(-Y, A, ones, [1.0])
+        x = res.x
+    elif objective == "water":
+        # need = max(0, 1 - 2 x.WC) * VF * BR / (x . VS_FM), with y = x / (x . VS_FM)
+        # and t = 1 / (x . VS_FM): minimize (1 - 2 WC) . y, x = y / t
+        c = np.append(1 - 2 * WC, 0.0)
+        A_ub = np.hstack([A, np.zeros([len(A), 1])])
+        A_eq = np.vstack([np.append(VS_FM, 0.0), np.append(np.ones(n), -1.0)])
+        res = _linprog(c, A_ub, A_eq, [1.0, 0.0])
+        x = None if res.x is None else res.x[:n] / res.x[n]
+    else:
+        x, res = _max_methane(A, Y, methane, n, tol)
+
+    if x is None or not res.success:
+        return ShareOptimum({}, objective, np.nan, None, [], False, res.message)
+
+    x = np.clip(x, 0, None)
+    x /= x.sum()
+    shares = {name: float(s) for name, s in zip(names, x) if s > tol}
+    share_matrix = np.zeros([1, len(data)])
+    share_matrix[0, idx] = x
+    mix = mix_characteristics(data, share_matrix, VF, [HRT], [BR])
+    checks = mix_checks(mix)
+    mix = mix.join(checks).iloc[0]
+    checks = checks.iloc[0]
+    if not checks.all():
+        failed = ", ".join(checks.index[~checks.to_numpy(dtype=bool)])
+        message = f"the optimized mix fails the check-up ({failed})"
+        return ShareOptimum(shares, objective, np.nan, mix, [], False, message)
+    BGP = VF * BR * (x @ Y)
+    value = {
+        "methane": BGP * (x @ methane),
+        "biogas": BGP,
+        "water": mix["add_water_need"],
+    }[objective]
+    slack = A @ x
+    scale = np.abs(A) @ x + 1e-300
+    binding = [label for label, s, m in zip(labels, slack, scale) if s >= -tol * m]
+    return ShareOptimum(
+        shares, objective, float(value), mix, binding, True, res.message
+    )
+
+
+def _max_methane(A, Y, methane, n, tol):
+    """
+    max (x . Y)(x . methane): for a methane content m the best biogas yield
+    V(m) is a concave LP value function, so m * V(m) is unimodal in m and a
+    golden-section search over m finds the optimum.
+    """
+    ones = np.ones([1, n])
+
+    def best_yield(m):
+        # x . (methane - m) >= 0
+        A_m = np.vstack([A, -(methane - m)])
+        res = _linprog(-Y, A_m, ones, [1.0])
+        value = -res.fun * m if res.success else -np.inf
+        return value, res
+
+    # feasible range of the methane content
+    low = _linprog(methane, A, ones, [1.0])
+    high = _linprog(-methane, A, ones, [1.0])
+    if not (low.success and high.success):
+        return None, low if not low.success else high
+    a, b = low.fun, -high.fun
+    g = (np.sqrt(5) - 1) / 2
+    c, d = b - g * (b - a), a + g * (b - a)
+    fc, rc = best_yield(c)
+    fd, rd = best_yield(d)
+    while b - a > tol * max(abs(b), 1):
+        if fc >= fd:
+            b, d, fd, rd = d, c, fc, rc
+            c = b - g * (b - a)
+            fc, rc = best_yield(c)
+        else:
+            a, c, fc, rc = c, d, fd, rd
+            d = a + g * (b - a)
+            fd, rd = best_yield(d)
+    res = rc if fc >= fd else rd
+    return res.x, res
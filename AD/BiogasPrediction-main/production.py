@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Production engine of the continuous biogas model.
+
+The reactor output on day t is the sum of the contributions of all portions
+fed on the days before, i.e. the convolution of the daily feed (kgVS/d) with
+the daily Gompertz increment per kgVS (L/(kgVS*d)). Only vectors of length tm
+are kept in memory.
+"""
+
+import numpy as np
+
+# above this number of multiply-adds the FFT convolution is faster than the
+# direct one (rough value measured with numpy 2.2 / scipy 1.15)
+DIRECT_CONVOLUTION_LIMIT = 50_000
+
+
+def daily_increment(BGP_perkgVS):
+    """
+    Daily biogas production per kgVS from the cumulative Gompertz curve
+    evaluated on days 0...HRT (L / (kgVS * d)).
+    """
+    return np.diff(np.asarray(BGP_perkgVS, dtype=float))
+
+
+def feed_series(tm, start, stop, amount):
+    """
+    Daily feed over the modelled time span: `amount` (e.g. kgVS/d) is fed on
+    every day from `start` (inclusive) to `stop` (exclusive), zero otherwise.
+    """
+    feed = np.zeros(tm)
+    feed[max(start, 0) : max(min(stop, tm), 0)] = amount
+    return feed
+
+
+def convolve_production(feed, kernel, method="auto"):
+    """
+    Daily production of the reactor caused by the daily `feed` when one unit
+    of feed produces `kernel[j]` on the j-th day after feeding.
+
+    method: "direct", "fft" or "auto" (chosen by the size of the problem).
+    Returns an array with the same length as `feed`.
+    """
+    feed = np.asarray(feed, dtype=float)
+    kernel = np.asarray(kernel, dtype=float)
+    tm = len(feed)
+    if tm == 0 or len(kernel) == 0:
+        return np.zeros(tm)
+    # days after tm are never needed
+    kernel = kernel[:tm]
+
+    if method == "auto":
+        method = "direct" if tm * len(kernel) <= DIRECT_CONVOLUTION_LIMIT else "fft"
+    if method == "direct":
+        return np.convolve(feed, kernel)[:tm]
+    if method == "fft":
+        from scipy.signal import fftconvolve
+
+        return fftconvolve(feed, kernel)[:tm]
+    raise ValueError(f"unknown convolution method: {method}")
+
+
+def segment_production(BGP_perkgVS, HRT, starts, stops, VS_feed, tm):
+    """
+    Daily biogas production caused by every segment (segments x tm, L/d).
+
+    BGP_perkgVS: cumulative production per kgVS of every mix on the days
+    0...max(HRT) (segments x max(HRT)+1); the curve of segment s is only used
+    up to HRT[s]. VS_feed: VS fed per day in every segment (kgVS/d).
+
+    The feed of a segment is constant between its start and stop, so the
+    convolution of the feed with the daily increment reduces to a difference
+    of the cumulative increment: prod(t) = VS_feed * (K(t - start) - K(t - stop)).
+    """
+    HRT = np.asarray(HRT, dtype=int)
+    starts = np.asarray(starts, dtype=int)
+    stops = np.asarray(stops, dtype=int)
+    nH = BGP_perkgVS.shape[1] - 1
+
+    # daily increment per kgVS, cut at the HRT of every segment
+    increment = np.diff(BGP_perkgVS, axis=1)
+    increment[np.arange(nH)[None, :] >= HRT[:, None]] = 0
+    # cumulative increment K(n) for n = -1...nH-1 (K(-1) = 0)
+    K = np.zeros([len(HRT), nH + 1])
+    np.cumsum(increment, axis=1, out=K[:, 1:])
+
+    # segments starting after the end of the model are never fed
+    starts = np.minimum(starts, stops)
+
+    t = np.arange(tm)[None, :]
+    rows = np.arange(len(HRT))[:, None]
+    since_start = np.clip(t - starts[:, None] + 1, 0, nH)
+    since_stop = np.clip(t - stops[:, None] + 1, 0, nH)
+    return np.asarray(VS_feed, dtype=float)[:, None] * (
+        K[rows, since_start] - K[rows, since_stop]
+    )
+
+
+def event_production(curve, HRT, times, amounts, dt, n):
+    """
+    Production per interval caused by feed events at arbitrary times.
+
+    curve: cumulative production per kgVS as a function of the time since
+    feeding (d, array in, array out), counted up to HRT (d). times: time of
+    the feed events (d), amounts: VS fed per event (kgVS). The model time is
+    split into n intervals of length dt (d); returns the production of every
+    interval (L per interval).
+
+    A portion fed at tau produces curve(b - tau) - curve(a - tau) in the
+    interval [a, b), both limited to 0...HRT, so the interval totals are
+    exact for any dt. Events with the same position within their interval
+    (phase) share one kernel and one convolution: O(n log n) per phase;
+    irregular events are added one kernel each if that is cheaper.
+    """
+    times = np.asarray(times, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    inside = (times >= 0) & (times < n * dt)
+    times, amounts = times[inside], amounts[inside]
+    steps = np.floor(times / dt).astype(int)
+    # (rounded, so float noise does not split a phase)
+    phase = np.round(times - steps * dt, 9)
+    length = min(n, int(np.ceil(HRT / dt)) + 1)
+    j = np.arange(length)
+    production = np.zeros(n)
+    phases = np.unique(phase)
+    if len(phases) * n * max(np.log2(n), 1) > len(times) * length:
+        # (irregular times: adding every event's kernel directly is cheaper)
+        size = max(1, 2**20 // length)  # events per block
+        for first in range(0, len(times), size):
+            value = phase[first : first + size, None]
+            a = np.clip(j * dt - value, 0, HRT)
+            b = np.clip((j + 1) * dt - value, 0, HRT)
+            kernels = (curve(b.ravel()) - curve(a.ravel())).reshape(a.shape)
+            target = steps[first : first + size, None] + j
+            valid = target < n
+            weights = (amounts[first : first + size, None] * kernels)[valid]
+            production += np.bincount(target[valid], weights, minlength=n)
+        return production
+    for value in phases:
+        at_phase = phase == value
+        a = np.clip(j * dt - value, 0, HRT)
+        b = np.clip((j + 1) * dt - value, 0, HRT)
+        kernel = curve(b) - curve(a)
+        feed = np.bincount(steps[at_phase], weights=amounts[at_phase], minlength=n)
+        production += convolve_production(feed, kernel)
+    return production
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Online recalibration of the model from plant measurements.
+
+Two recursive estimators, both updated once per day in constant time (no
+refit of the history):
+
+PlantCorrection: one factor c with measured = c * predicted, estimated by
+recursive least squares with exponential forgetting. The corrected forecast
+is c times the output of the production model.
+
+KineticsEstimator: the kinetic parameters P, Rm and l of the fed substrates,
+estimated by an extended Kalman filter. The feed of the last days (up to the
+largest HRT) is kept in a ring buffer; every day the production of these
+portions and its derivatives with respect to the parameters are evaluated
+with the current parameters, and the parameters are corrected by the
+difference to the measured production. The database values are the prior,
+so substrates that are fed rarely stay close to them. The estimated
+parameters are returned as a SubstrateRegistry for the production model.
+"""
+
+import numpy as np
+import pandas as pd
+
+from fitting import gompertz_jacobian
+from kinetics import Gompertz_Function
+from substrates import SubstrateRegistry, as_registry
+
+KINETIC_PARAMETERS = ["P", "Rm", "l"]
+
+
+class PlantCorrection:
+    """
+    Plant correction factor (measured / predicted production) by recursive
+    least squares; forgetting < 1 weights recent days higher (0.98: about
+    the last 50 days).
+    """
+
+    def __init__(self, forgetting=0.98, factor=1.0):
+        self.forgetting = forgetting
+        self.factor = factor
+        self._weight = 0.0  # forgotten sum of predicted^2
+
+    def update(self, predicted, measured):
+        """Update with one day, returns the corrected factor."""
+        if predicted > 0 and measured is not None and np.isfinite(measured):
+            self._weight = self.forgetting * self._weight + predicted**2
+            error = measured - self.factor * predicted
+            self.factor += predicted * error / self._weight
+        return self.factor
+
+    def correct(self, predicted):
+        """Corrected production of the model output."""
+        return self.factor * np.asarray(predicted)
+
+
+class KineticsEstimator:
+    """
+    Recursive estimation of P, Rm and l of the substrates `names`.
+
+    substrates: SubstrateRegistry or database DataFrame (prior values)
+    max_HRT: longest HRT of the plant (d), length of the feed buffer
+    forgetting: forgetting factor of the filter (1: no forgetting)
+    prior: relative standard deviation of the database values
+    noise: relative standard deviation of the measured production
+    """
+
+    def __init__(
+        self, substrates, names, max_HRT=100, forgetting=0.995, prior=0.2, noise=0.05
+    ):
+        self.substrates = as_registry(substrates)
+        self.names = list(names)
+        idx = self.substrates.lookup(self.names)
+        data = self.substrates.data.iloc[idx]
+        self.theta = data[KINETIC_PARAMETERS].to_numpy(dtype=float).copy()  # (n x 3)
+        # the filter works on parameters relative to the database values
+        self._scale = np.maximum(np.abs(self.theta), 1.0).ravel()
+        n = len(self.names)
+        self.cov = np.eye(3 * n) * prior**2
+        self._max_trace = np.trace(self.cov)
+        self.forgetting = forgetting
+        self.noise = noise
+        self._VS = ((1 - data["WC"]) * data["VS"]).to_numpy(dtype=float)
+        self._column = {name: i for i, name in enumerate(self.names)}
+        self._feed = np.zeros([max_HRT, n])  # VS fed x share (kgVS), ring buffer
+        self._HRT = np.zeros(max_HRT, dtype=int)
+        self._head = -1
+        self.day = 0
+
+    def update_mix(self, feed_FM, shares, HRT, measured=None):
+        """
+        One day of plant data: fresh mass fed (kg FM) of a mix {short name:
+        share}, its HRT (d) and the measured biogas production (L/d).
+        Returns the production predicted before the update.
+        """
+        share_vector = np.zeros(len(self.names))
+        for name, share in shares.items():
+            share_vector[self._column[name]] = share
+        VS_feed = feed_FM * (share_vector @ self._VS)
+        return self.update(VS_feed, share_vector, HRT, measured)
+
+    def update(self, VS_feed, share_vector, HRT, measured=None):
+        """
+        One day with the VS fed (kgVS) of a mix with the shares share_vector
+        (order of names). As in the production model, the mix produces the
+        share-weighted production per kgVS of its substrates.
+        """
+        M = len(self._feed)
+        if HRT > M:
+            raise ValueError(f"HRT is longer than max_HRT ({HRT} > {M})")
+        self._head = (self._head + 1) % M
+        self._feed[self._head] = VS_feed * np.asarray(share_vector, dtype=float)
+        self._HRT[self._head] = HRT
+        self.day += 1
+
+        # portions fed j days ago that still produce today
+        lags = np.arange(M)
+        slots = (self._head - lags) % M
+        active = lags < self._HRT[slots]
+        if not active.any():
+            return 0.0
+        lags = lags[active]
+        W = self._feed[slots[active]]  # (lags x substrates)
+        P, Rm, l = (self.theta[:, [k]] for k in range(3))
+        t0, t1 = lags[None, :].astype(float), lags[None, :] + 1.0
+        with np.errstate(over="ignore"):
+            G0, G1 = (Gompertz_Function(t, P, Rm, l) for t in (t0, t1))
+            J0, J1 = (gompertz_jacobian(t, P, Rm, l) for t in (t0, t1))
+        increment, d_increment = G1 - G0, J1 - J0
+        predicted = float(np.einsum("js,sj->", W, increment))
+        if measured is None or not np.isfinite(measured):
+            return predicted
+
+        # derivative of the prediction with respect to the relative parameters
+        H = np.einsum("js,sjk->sk", W, d_increment).ravel() * self._scale
+        R = (self.noise * max(abs(measured), 1.0)) ** 2
+        PH = self.cov @ H
+        gain = PH / (H @ PH + R)
+        step = gain * (measured - predicted)
+        self.theta += (step * self._scale).reshape(self.theta.shape)
+        # P and Rm stay positive, the lag phase not negative
+        self.theta[:, :2] = np.maximum(self.theta[:, :2], 1e-6)
+        self.theta[:, 2] = np.maximum(self.theta[:, 2], 0.0)
+        self.cov = (self.cov - np.outer(gain, PH)) / self.forgetting
+        # without new information the forgetting would let the covariance grow
+        # without bound: it is capped at the prior uncertainty
+        trace = np.trace(self.cov)
+        if trace > self._max_trace:
+            self.cov *= self._max_trace / trace
+        return predicted
+
+    def parameters(self):
+        """Current P, Rm, l with their standard deviations."""
+        std = np.sqrt(np.diag(self.cov)) * self._scale
+        table = pd.DataFrame(self.theta, columns=KINETIC_PARAMETERS)
+        table.insert(0, "Short", self.names)
+        for k, name in enumerate(KINETIC_PARAMETERS):
+            table[name + "_std"] = std[k::3]
+        return table
+
+    def registry(self):
+        """Substrate database with the current parameters, for run_model."""
+        data = self.substrates.data.copy()
+        idx = self.substrates.lookup(self.names)
+        for k, name in enumerate(KINETIC_PARAMETERS):
+            column = data[name].to_numpy(dtype=float)
+            column[idx] = self.theta[:, k]
+            data[name] = column
+        return SubstrateRegistry(data)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Binary storage of daily production series.
+
+A result store is a folder with a raw array (data.bin, rows x days, C order)
+and a small JSON header (header.json) with the dtype, the number of days,
+the row names (e.g. biogasMix1, ..., biogastotal or one row per scenario)
+and free attributes of the run. Rows are appended in chunks, so a run with
+many scenarios is written while it is computed, and readers memory-map the
+array: reading one row (or a day range of some rows) only touches the pages
+of that part of the file.
+
+    with ResultStore.create("output/run", days=tm, dtype="float32") as store:
+        for names, production in chunks:
+            store.append(production, names)
+
+    results = open_results("output/run")
+    results.row("biogastotal")  # one series, nothing else is read
+    results.days(100, 200)  # all rows on the days 100...199
+
+The csv export (`Results.to_csv`) writes the same format as
+output/outputdata_conti.csv.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+DATA_FILE = "data.bin"
+DTYPES = ("float32", "float64")
+
+
+class ResultStore:
+    """Writer of a result store, rows are appended in chunks."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self._file = open(os.path.join(path, DATA_FILE), "r+b")
+        self._file.seek(0, os.SEEK_END)
+
+    @classmethod
+    def create(cls, path, days, dtype="float64", attrs=None):
+        """
+        New (empty) store in the folder path, existing results are replaced.
+        dtype float32 halves the file size (about 7 significant digits).
+        """
+        if np.dtype(dtype).name not in DTYPES:
+            raise ValueError(f"dtype has to be one of {DTYPES}")
+        os.makedirs(path, exist_ok=True)
+        header = {
+            "version": FORMAT_VERSION,
+            # stored little-endian independent of the machine
+            "dtype": np.dtype(dtype).newbyteorder("<").str,
+            "days": int(days),
+            "rows": [],
+            "attrs": attrs or {},
+        }
+        open(os.path.join(path, DATA_FILE), "wb").close()
+        _write_header(path, header)
+        return cls(path, header)
+
+    @classmethod
+    def append_to(cls, path):
+        """Open an existing store to append further rows."""
+        return cls(path, _read_header(path))
+
+    def append(self, values, names):
+        """Append rows (rows x days) with their names."""
+        values = np.atleast_2d(np.asarray(values)).astype(self.header["dtype"])
+        names = [str(name) for name in names]
+        if values.shape != (len(names), self.header["days"]):
+            raise ValueError(
+                f"values need the shape (rows, days) = ({len(names)}, "
+                f"{self.header['days']}), got {values.shape}"
+            )
+        if len(set(names)) < len(names) or set(names) & set(self.header["rows"]):
+            raise ValueError("row names have to be unique")
+        self._file.write(np.ascontiguousarray(values).tobytes())
+        self._file.flush()
+        # the header is only updated after the data is written, so readers
+        # never see rows that are not complete
+        self.header["rows"] += names
+        _write_header(self.path, self.header)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Results:
+    """Read-only, memory-mapped view of a result store."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = _read_header(path)
+        self.names = list(self.header["rows"])
+        self.attrs = self.header["attrs"]
+        self._index = {name: i for i, name in enumerate(self.names)}
+        shape = (len(self.names), self.header["days"])
+        if shape[0] == 0:
+            self.data = np.empty(shape, dtype=self.header["dtype"])
+        else:
+            # (data written after the header was read is ignored)
+            self.data = np.memmap(
+                os.path.join(path, DATA_FILE),
+                dtype=self.header["dtype"],
+                mode="r",
+                shape=shape,
+            )
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, name):
+        """Daily series of one row (memory-mapped, no copy)."""
+        return self.data[self._index[name]]
+
+    def rows(self, names):
+        """Daily series of several rows (copied into memory)."""
+        return self.data[[self._index[name] for name in names]]
+
+    def days(self, start, stop, names=None):
+        """Day range start...stop-1 of all rows or of the given rows."""
+        data = self.data if names is None else self.rows(names)
+        return data[:, start:stop]
+
+    def to_frame(self, names=None):
+        """DataFrame with the column day and one column per row."""
+        names = self.names if names is None else list(names)
+        frame = pd.DataFrame({"day": range(self.header["days"])})
+        for name in names:
+            frame[name] = np.asarray(self.row(name), dtype=float)
+        return frame
+
+    def to_csv(self, path, names=None):
+        """Export in the format of output/outputdata_conti.csv."""
+        self.to_frame(names).to_csv(path, index=False, header=True, sep=";")
+
+    def to_npz(self, path, compressed=False):
+        """Export all rows to a single .npz file (loaded as a whole)."""
+        save = np.savez_compressed if compressed else np.savez
+        save(
+            path,
+            data=np.asarray(self.data),
+            names=np.array(self.names, dtype=str),
+            attrs=np.str_(json.dumps(self.attrs)),
+        )
+
+
+def open_results(path):
+    """Memory-mapped results of a store written by ResultStore."""
+    return Results(path)
+
+
+def save_results(path, values, names, dtype="float64", attrs=None):
+    """Write all rows (rows x days) to a new store at once."""
+    values = np.atleast_2d(values)
+    with ResultStore.create(path, values.shape[1], dtype, attrs) as store:
+        store.append(values, names)
+
+
+def _read_header(path):
+    with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported result format: {header.get('version')}")
+    return header
+
+
+def _write_header(path, header):
+    header_path = os.path.join(path, HEADER_FILE)
+    # write to a temporary file first, so a crash never leaves a broken header
+    tmp_path = header_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=1)
+    os.replace(tmp_path, header_path)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Batch evaluation of operating scenarios of the continuous biogas model.
+
+A scenario is one candidate operating point of the fermenter: HRT, organic
+loading rate BR, fermenter volume VF and the substrate shares, fed from day 0
+for the whole time span tm. All scenarios are evaluated together with NumPy
+broadcasting, one row per scenario.
+"""
+
+import numpy as np
+import pandas as pd
+
+from kinetics import curve_cache
+from production import segment_production
+from schedule import mix_characteristics, mix_checks
+from substrates import as_registry
+
+
+def scenario_shares(data, shares):
+    """
+    Share matrix (scenarios x substrates) in the order of data["Short"].
+
+    shares: either an array (scenarios x substrates) or a DataFrame with one
+    column per short name (missing substrates get a share of 0).
+    """
+    if isinstance(shares, pd.DataFrame):
+        unknown = set(shares.columns) - set(data["Short"])
+        if unknown:
+            raise KeyError(f"substrates not in the database: {sorted(unknown)}")
+        shares = shares.reindex(columns=data["Short"], fill_value=0.0)
+    shares = np.atleast_2d(np.asarray(shares, dtype=float))
+    if shares.shape[1] != len(data):
+        raise ValueError(
+            f"shares need one column per substrate ({shares.shape[1]} != {len(data)})"
+        )
+    return shares
+
+
+def evaluate_scenarios(data, HRT, BR, VF, shares, tm=None):
+    """
+    Evaluate many scenarios at once.
+
+    data: SubstrateRegistry or substrate database DataFrame
+    HRT (d), BR (kgVS/m^3/d), VF (m^3): scalars or one value per scenario
+    shares: share matrix (scenarios x substrates) or DataFrame, see scenario_shares
+    tm: if given, the daily biogas production of every scenario over tm days
+        is returned as well (scenarios x tm, L/d)
+
+    Returns a DataFrame with one row per scenario (mix characteristics,
+    check-up flags and the steady-state biogas and methane production) and,
+    if tm is given, the daily production series.
+    """
+    data = as_registry(data).data
+    shares = scenario_shares(data, shares)
+    n = len(shares)
+    HRT = np.broadcast_to(np.asarray(HRT, dtype=int), n)
+    BR = np.broadcast_to(np.asarray(BR, dtype=float), n)
+    VF = np.broadcast_to(np.asarray(VF, dtype=float), n)
+    if np.any(HRT < 1):
+        raise ValueError("HRT must be at least one day")
+
+    result = mix_characteristics(data, shares, VF, HRT, BR)
+    result.insert(0, "VF", VF)
+    result = pd.concat([result, mix_checks(result)], axis=1)
+
+    # cumulative production per kgVS of every scenario up to the largest HRT
+    BGP_substrates = curve_cache.curves(data["P"], data["Rm"], data["l"], HRT.max())
+    BGP_perkgVS = shares @ BGP_substrates  # (scenarios x days)
+
+    # after one HRT of constant feeding the reactor is in steady state:
+    # every day the feed of the last HRT days produces its full yield
+    VS_feed = (result["Feed"] * result["VS"]).to_numpy()  # (kgVS/d)
+    yield_perkgVS = BGP_perkgVS[np.arange(n), HRT] - BGP_perkgVS[:, 0]
+    result["BGP_steady"] = VS_feed * yield_perkgVS  # (L/d)
+    result["MP_steady"] = result["BGP_steady"] * result["methane"]  # (L/d)
+    if tm is None:
+        return result
+
+    BGP = segment_production(
+        BGP_perkgVS, HRT, np.zeros(n, dtype=int), np.full(n, tm), VS_feed, tm
+    )
+    return result, BGP
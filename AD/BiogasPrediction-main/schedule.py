@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Feed schedule of the continuous biogas model.
+
+A schedule is an ordered list of segments. Each segment starts at a day of
+substrate change and defines the substrate shares, the hydraulic retention
+time and the organic loading rate fed until the next change. All segments are
+processed together: mix characteristics are matrix products of the share
+matrix (segments x substrates) with the substrate database and the production
+of all segments is computed in one vectorized pass.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from kinetics import curve_cache, gompertz_curves
+from production import event_production, segment_production
+from substrates import as_registry
+
+# recommended operating range of the process
+CN_MIN, CN_MAX = 10, 35  # C/N - ratio
+BR_MIN, BR_MAX = 1.5, 3.5  # organic loading rate (kgVS/m^3/d)
+WC_MASHED_MIN = 0.88  # water content of the mashed substrate for wet fermentation
+
+
+@dataclass
+class Segment:
+    start: int  # day of substrate change (d)
+    shares: dict = field(default_factory=dict)  # {short name: share}
+    HRT: int = 30  # hydraulic retention time (d)
+    BR: float = 3.5  # organic loading rate (kgVS/m^3/d)
+
+
+class FeedSchedule:
+    """Ordered list of feed segments (substrate mixtures)."""
+
+    def __init__(self, segments=()):
+        self.segments = []
+        for segment in segments:
+            self.append(segment)
+
+    def add(self, start, shares, HRT, BR):
+        """Append a substrate change at day `start`."""
+        self.append(Segment(int(start), dict(shares), int(HRT), float(BR)))
+        return self
+
+    def append(self, segment):
+        if self.segments and segment.start < self.segments[-1].start:
+            raise ValueError(
+                f"segments must be ordered by start day ({segment.start} < {self.segments[-1].start})"
+            )
+        if segment.HRT < 1:
+            raise ValueError(f"HRT must be at least one day (got {segment.HRT})")
+        self.segments.append(segment)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    @property
+    def starts(self):
+        return np.array([s.start for s in self.segments], dtype=int)
+
+    def stops(self, tm):
+        """Last feeding day (exclusive) of every segment."""
+        return np.append(self.starts[1:], max(tm, self.starts[-1]))
+
+    @property
+    def HRT(self):
+        return np.array([s.HRT for s in self.segments], dtype=int)
+
+    @property
+    def BR(self):
+        return np.array([s.BR for s in self.segments], dtype=float)
+
+    def share_matrix(self, substrates):
+        """
+        Shares of all segments as a dense matrix (segments x substrates),
+        the columns follow the rows of `substrates` (SubstrateRegistry or
+        database DataFrame).
+        """
+        registry = as_registry(substrates)
+        return registry.share_matrix([s.shares for s in self.segments])
+
+
+def mix_characteristics(data, shares, VF, HRT, BR):
+    """
+    Characteristics of the substrate mixtures, one row per segment.
+
+    data: substrate database DataFrame (columns WC, VS, C, N, methane)
+    shares: share matrix (segments x substrates)
+    VF: volume of fermenter (m^3), HRT (d), BR (kgVS/m^3/d): one per segment
+    """
+    WC = data["WC"].to_numpy(dtype=float)
+    DM = 1 - WC
+    VS = data["VS"].to_numpy(dtype=float)
+    C = data["C"].to_numpy(dtype=float)
+    N = data["N"].to_numpy(dtype=float)
+    methane = data["methane"].to_numpy(dtype=float)
+    HRT = np.asarray(HRT, dtype=float)
+    BR = np.asarray(BR, dtype=float)
+
+    mix = pd.DataFrame({"HRT": HRT, "BR": BR})
+    mix["Share_sum"] = shares.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mix["CN"] = (shares @ C) / (shares @ N)
+        # Water, Dry Mass and Volatile Solids Content of the Substrate Mix (based on FM)
+        mix["WC"] = shares @ WC  # (% FM)
+        mix["DM"] = shares @ DM  # (% FM)
+        mix["VS"] = shares @ (DM * VS)  # (% FM)
+        mix["VS_DM"] = shares @ VS  # (% DM)
+        mix["methane"] = shares @ methane  # (%)
+
+        # amount of fresh substrate to be fed to the reator per day
+        Volume_Flow = VF / HRT  # (m^3 / d)
+        Feed = VF * BR / mix["VS"]  # (kg FM/d)
+        mix["Volume_Flow"] = Volume_Flow
+        mix["Feed"] = Feed
+
+        # Need for additional water
+        add_water_perday = Volume_Flow * 1000 - Feed  # (L/d)
+        add_water = add_water_perday / Feed  # (L/kg FM/d)
+        mix["add_water_perday"] = add_water_perday
+        mix["add_water"] = add_water
+
+        # Volatile Solids and Water Content in the mashed substrate mix
+        mix["VS_Mashed"] = Feed * mix["VS"] / (Volume_Flow * 1000)  # (%)
+        mix["WC_Mashed"] = (add_water_perday + Feed * mix["WC"]) / (
+            add_water_perday + Feed
+        )  # (%)
+
+        # Water Recovery, pressing down to 50% water content
+        water_recovery = add_water - ((0.5 - mix["WC"]) / (1 - 0.5))
+        mix["water_recovery_perday"] = add_water_perday - Feed * mix["DM"]
+        mix["water_recovery"] = water_recovery
+        mix["add_water_need"] = np.where(
+            add_water > water_recovery, (add_water - water_recovery) * Feed, 0.0
+        )
+    return mix
+
+
+def mix_checks(mix):
+    """
+    Check-up of the mixtures (True if the value lies in the optimum range),
+    one row per mix of mix_characteristics.
+    """
+    return pd.DataFrame(
+        {
+            "Share_ok": np.isclose(mix["Share_sum"], 1),
+            "BR_ok": (mix["BR"] >= BR_MIN) & (mix["BR"] <= BR_MAX),
+            "CN_ok": (mix["CN"] >= CN_MIN) & (mix["CN"] <= CN_MAX),
+            "WC_Mashed_ok": mix["WC_Mashed"] >= WC_MASHED_MIN,
+        },
+        index=mix.index,
+    )
+
+
+def run_schedule(data, schedule, VF, tm):
+    """
+    Evaluate all segments of a feed schedule.
+
+    data: SubstrateRegistry or substrate database DataFrame
+
+    Returns the mix characteristics (one row per segment, see
+    mix_characteristics) and the daily biogas production of every segment
+    (segments x tm, L/d). The reactor total is the sum over the segments.
+    """
+    if len(schedule) == 0:
+        raise ValueError("the feed schedule has no segments")
+    with stage("input processing"):
+        registry = as_registry(data)
+        data = registry.data
+        shares = schedule.share_matrix(registry)
+        HRT = schedule.HRT
+        mix = mix_characteristics(data, shares, VF, HRT, schedule.BR)
+        mix.insert(0, "start", schedule.starts)
+        mix.insert(1, "stop", np.minimum(schedule.stops(tm), tm))
+
+    with stage("mix production"):
+        # cumulative production per kgVS of every substrate and every mix
+        BGP_substrates = curve_cache.curves(
+            data["P"], data["Rm"], data["l"], HRT.max()
+        )
+        BGP_perkgVS = shares @ BGP_substrates
+
+        VS_feed = (mix["Feed"] * mix["VS"]).to_numpy()  # (kgVS/d)
+        BGP = segment_production(
+            BGP_perkgVS, HRT, mix["start"], mix["stop"], VS_feed, tm
+        )
+        # expected production at the last feeding day of each segment
+        last_day = np.clip(mix["stop"].to_numpy() - 1, 0, tm - 1)
+        mix["BGP_last_day"] = BGP[np.arange(len(mix)), last_day]
+    return mix, BGP
+
+
+def feed_events(schedule, mix, tm, feed_interval=24.0, offset=0.0):
+    """
+    Regular feed events of a schedule: every feed_interval hours (first at
+    offset hours after the start of each segment), each event with its part
+    of the daily feed. Returns a DataFrame with the columns time (h),
+    segment and feed (kg FM).
+    """
+    times, segments, feeds = [], [], []
+    stops = np.minimum(schedule.stops(tm), tm)
+    for k, (segment, stop) in enumerate(zip(schedule, stops)):
+        t = np.arange(segment.start * 24 + offset, stop * 24, feed_interval)
+        times.append(t)
+        segments.append(np.full(len(t), k))
+        feeds.append(np.full(len(t), mix["Feed"].iloc[k] * feed_interval / 24))
+    return pd.DataFrame(
+        {
+            "time": np.concatenate(times),
+            "segment": np.concatenate(segments),
+            "feed": np.concatenate(feeds),
+        }
+    )
+
+
+def run_schedule_subdaily(
+    data, schedule, VF, tm, dt=1.0, feed_interval=24.0, offset=0.0, events=None
+):
+    """
+    Evaluate a feed schedule on a time step of dt hours.
+
+    By default the daily feed of every segment is split into portions every
+    feed_interval hours (see feed_events); `events` (DataFrame with the
+    columns time (h), segment and feed (kg FM)) replaces them by the actual
+    feeding times and amounts.
+
+    Returns the mix characteristics, the feed events and the biogas
+    production of every segment per interval (segments x tm*24/dt, L per
+    interval). With dt=24 and feed_interval=24 the result equals run_schedule.
+    """
+    if len(schedule) == 0:
+        raise ValueError("the feed schedule has no segments")
+    registry = as_registry(data)
+    data = registry.data
+    shares = schedule.share_matrix(registry)
+    mix = mix_characteristics(data, shares, VF, schedule.HRT, schedule.BR)
+    mix.insert(0, "start", schedule.starts)
+    mix.insert(1, "stop", np.minimum(schedule.stops(tm), tm))
+    if events is None:
+        events = feed_events(schedule, mix, tm, feed_interval, offset)
+
+    n = int(np.ceil(tm * 24 / dt))
+    BGP = np.zeros([len(schedule), n])
+    segment_of_event = events["segment"].to_numpy(dtype=int)
+    for k, segment in enumerate(schedule):
+        at_segment = segment_of_event == k
+        if not at_segment.any():
+            continue
+        used = np.flatnonzero(shares[k])
+        sub = data.iloc[used]
+        P, Rm, l = (sub[c].to_numpy(dtype=float) for c in ("P", "Rm", "l"))
+
+        def curve(t, w=shares[k, used], P=P, Rm=Rm, l=l):
+            return w @ gompertz_curves(t, P, Rm, l)
+
+        VS_fed = events["feed"].to_numpy(dtype=float)[at_segment] * mix["VS"].iloc[k]
+        BGP[k] = event_production(
+            curve,
+            segment.HRT,
+            events["time"].to_numpy(dtype=float)[at_segment] / 24,
+            VS_fed,
+            dt / 24,
+            n,
+        )
+    return mix, events, BGP
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+Local prediction server of the continuous biogas model (HTTP / JSON).
+
+    python server.py --port 8765 --workers 2
+
+    POST /predict   {"VF": 700, "tm": 200,
+                     "schedule": [{"start": 0, "shares": {"Sample1": 0.36, ...},
+                                   "HRT": 30, "BR": 3.5}, ...]}
+                    -> {"biogas": [...], "methane": [...], "mix": [{...}, ...]}
+    GET  /stats     latency and throughput statistics
+    GET  /health
+
+Concurrent requests are collected into micro-batches (up to max_batch
+requests, at most MAX_BATCH_CELLS segment days, or max_wait seconds after
+the first one) and evaluated together as
+one fleet (fleet.py, one digester per request and time span). Batches run in
+a pool of worker processes that load the substrate database once and keep
+their caches warm, so the event loop only parses and answers requests.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fleet import FLEET_COLUMNS, run_fleet
+from model import DEFAULT_DATABASE, load_substrates
+from schedule import FeedSchedule
+
+MAX_BODY = 1 << 20  # bytes
+# limits of a request (larger values would allocate tm x HRT arrays)
+MAX_TM = 36500  # (d)
+MAX_HRT = 1000  # (d)
+MAX_SEGMENTS = 1000
+# segments x tm of a request and of a batch (the segment production is one
+# float64 array of that size per batch)
+MAX_CELLS = 2_000_000
+MAX_BATCH_CELLS = 8_000_000
+MIX_COLUMNS = [
+    "start",
+    "stop",
+    "HRT",
+    "BR",
+    "CN",
+    "WC",
+    "VS",
+    "methane",
+    "Feed",
+    "add_water",
+    "WC_Mashed",
+    "water_recovery",
+    "add_water_need",
+    "Share_ok",
+    "BR_ok",
+    "CN_ok",
+    "WC_Mashed_ok",
+]
+
+_database = None  # database path of the worker process
+
+
+def _init_worker(database):
+    global _database
+    _database = database
+    load_substrates(database)  # warm start
+
+
+def parse_request(payload):
+    """Checked (VF, tm, FeedSchedule) of a /predict request."""
+    try:
+        VF = float(payload["VF"])
+        tm = int(payload["tm"])
+        segments = payload["schedule"]
+        if len(segments) > MAX_SEGMENTS:
+            raise ValueError(f"the schedule has more than {MAX_SEGMENTS} segments")
+        schedule = FeedSchedule()
+        for segment in segments:
+            shares = {str(k): float(v) for k, v in segment["shares"].items()}
+            schedule.add(segment["start"], shares, segment["HRT"], segment["BR"])
+    except (KeyError, TypeError, AttributeError, OverflowError) as e:
+        raise ValueError(f"invalid request: {e!r}") from None
+    if not (math.isfinite(VF) and VF > 0 and 0 < tm <= MAX_TM and len(schedule)):
+        raise ValueError(
+            f"VF has to be positive, tm within 1...{MAX_TM} d and the schedule "
+            "not empty"
+        )
+    for segment in schedule:
+        if not 0 <= segment.start < tm:
+            raise ValueError(f"segment start {segment.start} is not within 0...tm-1")
+        if segment.HRT > MAX_HRT:
+            raise ValueError(f"HRT {segment.HRT} d is longer than {MAX_HRT} d")
+        if not (math.isfinite(segment.BR) and segment.BR > 0):
+            raise ValueError(f"BR has to be positive (got {segment.BR})")
+        if not segment.shares or not all(
+            0 <= share <= 1 for share in segment.shares.values()
+        ):
+            raise ValueError("shares have to be within 0...1 (and at least one)")
+        if not sum(segment.shares.values()) > 0:
+            raise ValueError(f"the shares of the segment at {segment.start} sum to 0")
+    if len(schedule) * tm > MAX_CELLS:
+        raise ValueError(
+            f"{len(schedule)} segments over {tm} d exceed {MAX_CELLS} segment days"
+        )
+    return VF, tm, schedule
+
+
+def _cells(request):
+    """Segment days (segments x tm) of a parsed request."""
+    _, tm, schedule = request
+    return len(schedule) * tm
+
+
+def predict_batch(requests, database=None):
+    """
+    Predictions of a batch of (VF, tm, FeedSchedule): one dict per request,
+    or {"error": message} for requests with unknown substrates.
+    """
+    registry = load_substrates(database or _database or DEFAULT_DATABASE)
+    responses = [None] * len(requests)
+    by_tm = {}
+    for i, (VF, tm, schedule) in enumerate(requests):
+        unknown = {n for s in schedule for n in s.shares if n not in registry}
+        if unknown:
+            message = f"substrates not in the database: {sorted(unknown)}"
+            responses[i] = {"error": message}
+        else:
+            by_tm.setdefault(tm, []).append(i)
+
+    for tm, members in by_tm.items():
+        try:
+            _predict_group(registry, requests, members, tm, responses)
+        except Exception:
+            if len(members) == 1:
+                raise
+            # one request can fail the group: evaluate them one at a time, so
+            # the failure only reaches that request
+            for i in members:
+                try:
+                    _predict_group(registry, requests, [i], tm, responses)
+                except Exception as e:
+                    message = f"prediction failed: {e!r}"
+                    responses[i] = {"error": message, "status": 500}
+    return responses
+
+
+def _predict_group(registry, requests, members, tm, responses):
+    """Evaluate the requests `members` with the same tm as one fleet."""
+    rows = [
+        (i, requests[i][0], s.start, s.HRT, s.BR, s.shares)
+        for i in members
+        for s in requests[i][2]
+    ]
+    fleet = pd.DataFrame(rows, columns=FLEET_COLUMNS + ["shares"])
+    result = run_fleet(registry, fleet, tm)
+    mixes = {i: [] for i in members}
+    records = result.mix[MIX_COLUMNS].to_dict("records")
+    for digester, record in zip(result.mix["digester"], records):
+        mixes[digester].append({k: _finite(v) for k, v in record.items()})
+    for k, i in enumerate(result.digesters):
+        responses[i] = {
+            "biogas": _finite_series(result.biogas[k]),
+            "methane": _finite_series(result.methane[k]),
+            "mix": mixes[i],
+        }
+
+
+class LatencyStats:
+    """Latency (s) of the last requests and throughput counters."""
+
+    def __init__(self, window=10_000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self._latencies = deque(maxlen=window)
+        self._finished = deque(maxlen=window)  # time of the last requests
+
+    def add(self, latency, error=False):
+        self.requests += 1
+        self.errors += error
+        self._latencies.append(latency)
+        self._finished.append(time.monotonic())
+
+    def add_batch(self, size):
+        self.batches += 1
+        self.batched_requests += size
+
+    def to_dict(self):
+        uptime = time.monotonic() - self.started
+        stats = {
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_requests / max(self.batches, 1),
+            "throughput_rps": self.requests / max(uptime, 1e-9),
+        }
+        if len(self._finished) > 1:
+            span = self._finished[-1] - self._finished[0]
+            stats["recent_throughput_rps"] = (len(self._finished) - 1) / max(span, 1e-9)
+        if self._latencies:
+            latencies = np.array(self._latencies) * 1000
+            for q in (50, 90, 99):
+                stats[f"latency_p{q}_ms"] = float(np.percentile(latencies, q))
+            stats["latency_max_ms"] = float(latencies.max())
+        return stats
+
+
+class PredictionServer:
+    """
+    asyncio HTTP server with micro-batching.
+
+    max_batch: largest number of requests evaluated together
+    max_wait: time (s) a batch waits for further requests after the first
+    workers: worker processes (0: evaluate in a thread of this process)
+    """
+
+    def __init__(
+        self,
+        database=DEFAULT_DATABASE,
+        host="127.0.0.1",
+        port=8765,
+        max_batch=64,
+        max_wait=0.005,
+        workers=2,
+    ):
+        self.database = database
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.workers = workers
+        self.stats = LatencyStats()
+        self._queue = None
+        self._pool = None
+        self._slots = None
+        self._server = None
+        self._next = None  # request held back for the next batch
+
+    async def start(self):
+        load_substrates(self.database)  # fail early if the database is broken
+        if self.workers:
+            # (fresh interpreters: forking a process with BLAS threads can deadlock)
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.database,),
+            )
+        self._queue = asyncio.Queue()
+        # at most one batch per worker is evaluated at a time
+        self._slots = asyncio.Semaphore(max(self.workers, 1))
+        self._batcher = asyncio.create_task(self._collect_batches())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def predict(self, request):
+        """Prediction of one parsed request, evaluated in the next batch."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    async def _collect_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._next is None:
+                batch = [await self._queue.get()]
+            else:
+                batch, self._next = [self._next], None
+            cells = _cells(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if cells + _cells(item[0]) > MAX_BATCH_CELLS:
+                    self._next = item
+                    break
+                batch.append(item)
+                cells += _cells(item[0])
+            await self._slots.acquire()
+            asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        requests = [request for request, _ in batch]
+        self.stats.add_batch(len(batch))
+        try:
+            try:
+                responses = await loop.run_in_executor(
+                    self._pool, predict_batch, requests, self.database
+                )
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # the whole batch failed (e.g. a crashed worker): retry the
+                # requests one at a time, so only the failing one gets the error
+                responses = []
+                for request in requests:
+                    try:
+                        responses.extend(
+                            await loop.run_in_executor(
+                                self._pool, predict_batch, [request], self.database
+                            )
+                        )
+                    except Exception as e:
+                        responses.append(e)
+        except Exception as e:
+            responses = [e]
+        finally:
+            self._slots.release()
+        for (_, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if isinstance(response, Exception):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
+    async def _handle(self, reader, writer):
+        t0 = time.monotonic()
+        path, status, response = None, 500, {"error": "internal error"}
+        try:
+            method, path, body = await _read_request(reader)
+            if method == "POST" and path == "/predict":
+                try:
+                    request = parse_request(json.loads(body))
+                except ValueError as e:
+                    status, response = 400, {"error": str(e)}
+                else:
+                    response = await self.predict(request)
+                    if "error" in response:
+                        response = dict(response)
+                        status = response.pop("status", 400)
+                    else:
+                        status = 200
+            elif method == "GET" and path == "/stats":
+                status, response = 200, self.stats.to_dict()
+            elif method == "GET" and path == "/health":
+                status, response = 200, {"status": "ok"}
+            else:
+                status, response = 404, {"error": f"unknown endpoint {method} {path}"}
+        except ValueError as e:
+            status, response = 400, {"error": str(e)}
+        except Exception as e:
+            status, response = 500, {"error": f"prediction failed: {e!r}"}
+        finally:
+            await _write_response(writer, status, response)
+            if path == "/predict":
+                self.stats.add(time.monotonic() - t0, error=status != 200)
+
+
+async def _read_request(reader):
+    """Method, path and body of an HTTP/1.1 request."""
+    line = await reader.readline()
+    try:
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ValueError("malformed request line") from None
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    if length > MAX_BODY:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?")[0], body
+
+
+async def _write_response(writer, status, payload):
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(
+        status, "Internal Server Error"
+    )
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    try:
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+def _finite(value):
+    """JSON value of a number (NaN and infinity are not valid JSON)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _finite_series(values):
+    """JSON list of a float array, NaN and infinity as null."""
+    values = np.asarray(values, dtype=float)
+    if np.isfinite(values).all():
+        return values.tolist()
+    return [v if math.isfinite(v) else None for v in values.tolist()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local biogas prediction server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait", type=float, default=0.005, help="seconds")
+    args = parser.parse_args(argv)
+    server = PredictionServer(
+        args.database, args.host, args.port, args.max_batch, args.max_wait, args.workers
+    )
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Substrate database of the continuous biogas model.
+
+The `;`-separated database is parsed once and cached as a binary columnar
+file (.npz, one array per column) next to the source. The cache is reused as
+long as the modification time of the source is unchanged, or its content hash
+is the same (e.g. after a checkout that only touched the mtime).
+
+The SubstrateRegistry indexes the substrates by their short name, so the
+shares of a mix are turned into a dense share vector with one gather.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+CACHE_SUFFIX = ".cache.npz"
+
+
+def read_database(path):
+    """Parse the substrate database (csv file separated by ;)."""
+    data = pd.read_csv(path, sep=";", skipinitialspace=True)
+    data.columns = data.columns.str.strip()
+    data["Short"] = data["Short"].str.strip()
+    return data
+
+
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _read_cache(cache_path):
+    with np.load(cache_path, allow_pickle=False) as cache:
+        meta = {
+            "mtime": int(cache["__mtime"]),
+            "hash": str(cache["__hash"]),
+        }
+        columns = [str(c) for c in cache["__columns"]]
+        data = pd.DataFrame({c: cache["col_" + c] for c in columns})
+    return meta, data
+
+
+def _write_cache(cache_path, data, mtime, digest):
+    arrays = {"__mtime": np.int64(mtime), "__hash": np.str_(digest)}
+    arrays["__columns"] = np.array(list(data.columns), dtype=str)
+    for c in data.columns:
+        column = data[c].to_numpy()
+        if column.dtype == object:
+            column = column.astype(str)
+        arrays["col_" + c] = column
+    # write to a temporary file first, so a crash never leaves a broken cache
+    tmp_path = cache_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def load_database(path, cache=True):
+    """
+    Substrate database as DataFrame, read from the binary cache if the
+    source is unchanged. cache=False always parses the csv file.
+    """
+    if not cache:
+        return read_database(path)
+    cache_path = path + CACHE_SUFFIX
+    mtime = os.stat(path).st_mtime_ns
+    digest = None
+    if os.path.exists(cache_path):
+        try:
+            meta, data = _read_cache(cache_path)
+        except (OSError, KeyError, ValueError):
+            meta, data = None, None  # broken cache, parse the source again
+        if meta is not None:
+            if meta["mtime"] == mtime:
+                return data
+            digest = _file_hash(path)
+            if meta["hash"] == digest:
+                _try_write_cache(cache_path, data, mtime, digest)
+                return data
+    data = read_database(path)
+    _try_write_cache(cache_path, data, mtime, digest or _file_hash(path))
+    return data
+
+
+def _try_write_cache(cache_path, data, mtime, digest):
+    try:
+        _write_cache(cache_path, data, mtime, digest)
+    except OSError:
+        pass  # e.g. read-only data folder, the csv is parsed next time again
+
+
+class SubstrateRegistry:
+    """Substrate database indexed by the short name of the substrates."""
+
+    def __init__(self, data):
+        data = data.reset_index(drop=True)
+        duplicated = data["Short"][data["Short"].duplicated()]
+        if len(duplicated):
+            raise ValueError(
+                f"short names have to be unique: {sorted(set(duplicated))}"
+            )
+        self.data = data
+        self.index = dict(zip(data["Short"], range(len(data))))
+
+    @classmethod
+    def from_file(cls, path, cache=True):
+        return cls(load_database(path, cache=cache))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, short):
+        return short in self.index
+
+    def lookup(self, shorts):
+        """Row numbers of the given short names."""
+        try:
+            return np.fromiter(
+                (self.index[s] for s in shorts), dtype=int, count=len(shorts)
+            )
+        except KeyError as e:
+            raise KeyError(f"substrate {e.args[0]!r} is not in the database") from None
+
+    def share_vector(self, shares):
+        """Dense share vector (one entry per substrate) of {short name: share}."""
+        vector = np.zeros(len(self))
+        vector[self.lookup(list(shares))] = list(shares.values())
+        return vector
+
+    def share_matrix(self, mixes):
+        """Dense share matrix (mixes x substrates) of several {short name: share}."""
+        names = [name for shares in mixes for name in shares]
+        values = [value for shares in mixes for value in shares.values()]
+        rows = np.repeat(np.arange(len(mixes)), [len(shares) for shares in mixes])
+        matrix = np.zeros([len(mixes), len(self)])
+        matrix[rows, self.lookup(names)] = values
+        return matrix
+
+
+def as_registry(data):
+    """SubstrateRegistry of a database DataFrame (registries are passed through)."""
+    if isinstance(data, SubstrateRegistry):
+        return data
+    return SubstrateRegistry(data)
@@ -0,0 +1,170 @@
+"""
+Drying-and-blending plan at minimum drying energy.
+
+Which streams to use, how far to dry them and in which proportions, so that
+the blend reaches a minimum LHV as received and stays below an ash limit,
+with the least water evaporated (drying energy = water removed x
+DELTA_H_EVAP).
+
+With the used fraction u_i of every stream and the water v_i it keeps after
+drying, the blend is linear in (u, v):
+
+    dry solids     d_i = u_i * m_i * (1 - w_i)
+    LHV_ar >= spec    sum d_i * (LHV_dry_i - spec) - (2.442 + spec) * sum v_i >= 0
+    ash <= limit      sum d_i * (ash_i - limit) <= 0
+    fuel energy       sum d_i * LHV_dry_i - 2.442 * sum v_i  (GJ, t x MJ/kg)
+    water removed     sum u_i * m_i * w_i - v_i
+
+so the plan is one linear program (scipy HiGHS), solved in milliseconds for
+dozens of streams.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.optimize import linprog
+
+from blending import DELTA_H_EVAP, H_EVAP_LHV, Blend, blend
+from drying_kinetics import EQUILIBRIUM_MOISTURE
+
+# relative margin of the specification, so float noise of the LP solution does
+# not put the plan just outside it
+MARGIN = 1e-9
+
+
+@dataclass
+class DryingPlan:
+    """Optimal use and drying of the streams."""
+
+    fraction_used: np.ndarray  # (-) of every stream
+    target_moisture: np.ndarray  # (-) after drying
+    water_removed: np.ndarray  # (t) per stream
+    energy_GJ: float  # drying energy
+    energy_MWh: float
+    fuel_MWh: float  # fuel potential of the blend (mass x LHV_ar)
+    blend: Blend
+
+    @property
+    def mass_used(self):
+        """As-received mass taken from every stream (t)."""
+        return self.blend.mass_ar
+
+
+def optimize_drying(
+    mass,
+    moisture,
+    LHV_dry,
+    ash_dry,
+    LHV_ar_min,
+    ash_max=np.inf,
+    demand_MWh=None,
+    dryable=True,
+    min_moisture=EQUILIBRIUM_MOISTURE,
+    delta_h_evap=DELTA_H_EVAP,
+):
+    """
+    Drying plan of the streams at minimum drying energy.
+
+    mass (t), moisture (-, as received), LHV_dry (MJ/kg) and ash_dry (%) of
+    the available streams; the blend has to reach LHV_ar >= LHV_ar_min
+    (MJ/kg) and ash_dry <= ash_max (%).
+
+    demand_MWh: fuel potential the blend has to supply (> 0); None: all
+        streams are used completely and only the drying is optimized
+    dryable: streams that can be dried (bool, one per stream or for all)
+    min_moisture: lowest moisture a stream can be dried to (-), default the
+        equilibrium moisture of drying_kinetics (0 means bone-dry)
+
+    Raises ValueError if no plan meets the specification.
+    """
+    mass, moisture, LHV_dry, ash_dry = (
+        np.asarray(x, dtype=float).ravel() for x in (mass, moisture, LHV_dry, ash_dry)
+    )
+    n = len(mass)
+    if demand_MWh is not None and not demand_MWh > 0:
+        raise ValueError(f"the fuel demand has to be positive (got {demand_MWh} MWh)")
+    dryable = np.broadcast_to(np.asarray(dryable, dtype=bool), (n,))
+    min_moisture = np.broadcast_to(np.asarray(min_moisture, dtype=float), (n,))
+    LHV_spec = LHV_ar_min + MARGIN * max(abs(LHV_ar_min), 1.0)
+    ash_spec = ash_max - MARGIN * max(abs(ash_max), 1.0)
+    solids = mass * (1 - moisture)  # (t) per stream if used completely
+    water = mass * moisture  # (t)
+
+    # variables x = [u (n), v (n)], minimize the water removed sum(u * water - v);
+    # the blend only depends on the total water, so among equal plans the
+    # wetter streams are dried first (slightly cheaper water)
+    weight = 1 + 1e-6 * (1 - moisture)
+    cost = np.concatenate([weight * water, -weight])
+    eye = np.eye(n)
+    # water kept: v_i <= u_i * water_i, and not drier than min_moisture
+    min_water = np.minimum(solids * min_moisture / (1 - min_moisture), water)
+    A_ub = [np.hstack([-eye * water, eye]), np.hstack([eye * min_water, -eye])]
+    b_ub = [np.zeros(n), np.zeros(n)]
+    # LHV_ar of the blend and its ash content
+    LHV_row = [-solids * (LHV_dry - LHV_spec), np.full(n, H_EVAP_LHV + LHV_spec)]
+    A_ub.append(np.concatenate(LHV_row))
+    b_ub.append([0.0])
+    if np.isfinite(ash_max):
+        A_ub.append(np.concatenate([solids * (ash_dry - ash_spec), np.zeros(n)]))
+        b_ub.append([0.0])
+    if demand_MWh is not None:
+        A_ub.append(np.concatenate([-solids * LHV_dry, np.full(n, H_EVAP_LHV)]))
+        b_ub.append([-3.6 * demand_MWh * (1 + MARGIN)])  # (GJ)
+    # streams that cannot be dried keep all their water
+    fixed = np.flatnonzero(~dryable)
+    A_eq = b_eq = None
+    if len(fixed):
+        A_eq = np.hstack([-eye[fixed] * water, eye[fixed]])
+        b_eq = np.zeros(len(fixed))
+    u_bounds = (0, 1) if demand_MWh is not None else (1, 1)
+    bounds = [u_bounds] * n + [(0, None)] * n
+
+    solution = linprog(
+        cost,
+        A_ub=np.vstack([np.atleast_2d(a) for a in A_ub]),
+        b_ub=np.concatenate([np.atleast_1d(b) for b in b_ub]),
+        A_eq=A_eq,
+        b_eq=b_eq,
+        bounds=bounds,
+        method="highs",
+    )
+    if solution.status != 0:
+        raise ValueError(f"no drying plan meets the specification: {solution.message}")
+
+    u = np.clip(solution.x[:n], 0, 1)
+    kept = np.minimum(solution.x[n:], u * water)
+    used_solids = u * solids
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target = np.where(u > 0, kept / (used_solids + kept), moisture)
+    # blend of the plan, the dried streams at exactly their target moisture
+    target = np.where(u > 0, target, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = blend(u * mass, moisture, LHV_dry, ash_dry, target)
+    fuel_MWh = float(result.total_mass * result.LHV_ar / 3.6)
+    if not (
+        result.total_mass > 0
+        and np.isfinite(result.LHV_ar)
+        and np.isfinite(result.ash_dry)
+    ):
+        raise ValueError("the drying plan uses none of the streams")
+    if (
+        result.LHV_ar < LHV_ar_min
+        or result.ash_dry > ash_max
+        or (demand_MWh is not None and fuel_MWh < demand_MWh)
+    ):
+        raise ValueError(
+            "the drying plan misses the specification: "
+            f"LHV_ar {float(result.LHV_ar)} MJ/kg, ash {float(result.ash_dry)} %, "
+            f"fuel {fuel_MWh} MWh"
+        )
+    water_removed = result.water_removed
+    energy = water_removed.sum() * 1000 * delta_h_evap  # (J)
+    return DryingPlan(
+        fraction_used=u,
+        target_moisture=result.moisture,
+        water_removed=water_removed,
+        energy_GJ=energy / 1e9,
+        energy_MWh=energy / 3.6e9,
+        fuel_MWh=fuel_MWh,
+        blend=result,
+    )
@@ -0,0 +1,116 @@
+"""
+Blending of solid fuel streams with optional drying.
+
+Every input is an array over streams (last axis); leading axes are
+independent blend batches, so one call evaluates e.g. (days x deliveries):
+
+    result = blend(mass, moisture, LHV_dry, ash_dry, target_moisture)
+    result.LHV_ar      # (batch,) as-received LHV of every blend
+    result.mass        # (batch x streams) mass after drying
+
+Moistures are fractions (0-1) on the as-received basis, LHV in MJ/kg and ash
+in % on the dry basis. A stream is dried to its target moisture if it is
+wetter (NaN: no drying), the blend properties are the dry-mass weighted
+averages of the streams.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+H_EVAP_LHV = 2.442  # (MJ/kg) heat of vaporization of water in the LHV
+DELTA_H_EVAP = 2.5735e6  # (J/kg) drying energy per kg of water removed
+
+
+def perform_drying(mass_ar, moist_ar, target_moist):
+    """
+    Calculates mass after drying to target moisture.
+    If current moisture <= target (or the target is NaN), no drying occurs.
+    Works element-wise on arrays; returns (mass_final, moist_final).
+    """
+    mass_ar = np.asarray(mass_ar, dtype=float)
+    moist_ar = np.asarray(moist_ar, dtype=float)
+    target_moist = np.asarray(target_moist, dtype=float)
+    dried = moist_ar > target_moist  # (False for NaN)
+
+    # mass_final * (1 - target_moist) = mass_solid
+    mass_solid = mass_ar * (1 - moist_ar)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mass_final = np.where(dried, mass_solid / (1 - target_moist), mass_ar)
+    moist_final = np.where(dried, target_moist, moist_ar)
+    return mass_final, moist_final
+
+
+def lhv_ar(lhv_dry, moisture):
+    """LHV as received (MJ/kg): LHV_ar = LHV_dry * (1 - w) - 2.442 * w."""
+    moisture = np.asarray(moisture, dtype=float)
+    return np.asarray(lhv_dry, dtype=float) * (1 - moisture) - H_EVAP_LHV * moisture
+
+
+@dataclass
+class Blend:
+    """Streams after drying (... x streams) and blend properties (...)."""
+
+    mass_ar: np.ndarray  # (t) before drying
+    moisture_ar: np.ndarray  # (-) before drying
+    mass: np.ndarray  # (t) after drying
+    moisture: np.ndarray  # (-) after drying
+    LHV_dry_streams: np.ndarray  # (MJ/kg)
+    ash_dry_streams: np.ndarray  # (%)
+    total_mass: np.ndarray  # (t)
+    total_dry_mass: np.ndarray  # (t)
+    mix_moisture: np.ndarray  # (-)
+    LHV_dry: np.ndarray  # (MJ/kg)
+    ash_dry: np.ndarray  # (%)
+    LHV_ar: np.ndarray  # (MJ/kg)
+
+    @property
+    def water_removed(self):
+        """Water evaporated per stream (t)."""
+        return self.mass_ar - self.mass
+
+    @property
+    def LHV_ar_streams(self):
+        """As-received LHV of the streams after drying (MJ/kg)."""
+        return lhv_ar(self.LHV_dry_streams, self.moisture)
+
+
+def blend(mass, moisture, LHV_dry, ash_dry, target_moisture=np.nan):
+    """
+    Dry the streams to their target moisture and blend them.
+
+    mass (t), moisture (-, as received), LHV_dry (MJ/kg), ash_dry (%) and
+    target_moisture (-, NaN: not dried) broadcast against each other; the
+    last axis are the streams of one blend.
+    """
+    inputs = (mass, moisture, LHV_dry, ash_dry, target_moisture)
+    mass, moisture, LHV_dry, ash_dry, target_moisture = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in inputs)
+    )
+    if mass.ndim == 0:
+        raise ValueError("blend needs an array of streams")
+    mass_final, moist_final = perform_drying(mass, moisture, target_moisture)
+
+    # dry masses (solids) and dry-basis weighted averages
+    dry = mass_final * (1 - moist_final)
+    total_dry_mass = dry.sum(axis=-1)
+    total_wet_mass = mass_final.sum(axis=-1)
+    total_water_mass = total_wet_mass - total_dry_mass
+    mix_moisture = total_water_mass / total_wet_mass
+    LHV_dry_mix = (dry * LHV_dry).sum(axis=-1) / total_dry_mass
+    ash_dry_mix = (dry * ash_dry).sum(axis=-1) / total_dry_mass
+
+    return Blend(
+        mass_ar=mass,
+        moisture_ar=moisture,
+        mass=mass_final,
+        moisture=moist_final,
+        LHV_dry_streams=LHV_dry,
+        ash_dry_streams=ash_dry,
+        total_mass=total_wet_mass,
+        total_dry_mass=total_dry_mass,
+        mix_moisture=mix_moisture,
+        LHV_dry=LHV_dry_mix,
+        ash_dry=ash_dry_mix,
+        LHV_ar=lhv_ar(LHV_dry_mix, mix_moisture),
+    )
@@ -0,0 +1,198 @@
+"""
+Drying kinetics of fuel parcels in a belt or drum dryer.
+
+Thermal_drying.py balances the start and end state only. Here the moisture
+of many parcels is integrated over time as one vectorized ODE system, so the
+residence time (and with the throughput the dryer holdup) to reach a target
+moisture follows. Per parcel, X is the moisture on dry basis (kg water / kg
+solids):
+
+    constant rate   X > X_c:        dX/dt = -N_c
+    falling rate    X_eq < X < X_c: dX/dt = -N_c (X - X_eq) / (X_c - X_eq)
+
+    N_c = h (T_air - T_wet_bulb) * 6 / (density * diameter) / delta_h_evap
+
+i.e. in the constant rate period the heat transferred to the particle surface
+(spheres of the given diameter) evaporates the surface water, below the
+critical moisture the rate falls linearly to zero at the equilibrium
+moisture of the air conditions.
+
+    profile = simulate_drying(moisture=[0.6, 0.7], diameter=[0.01, 0.02],
+                              T_air=393.15, T_wet_bulb=323.15, t_end=4 * 3600)
+    profile.moisture          # (times x parcels), as-received fraction
+    profile.residence_time(0.2)
+
+The energy is the evaporated water times delta_h_evap, so run to the
+equilibrium moisture it is the end-state energy of Thermal_drying.py (and
+drying_sweep) for that target moisture.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from blending import DELTA_H_EVAP
+
+EQUILIBRIUM_MOISTURE = 0.05  # (-) as-received, of wood chips in warm dryer air
+
+
+@dataclass
+class DryingProfile:
+    """Moisture and drying energy of the parcels over time."""
+
+    t: np.ndarray  # (s)
+    moisture: np.ndarray  # (times x parcels) as-received fraction
+    mass_solid: np.ndarray  # (t) per parcel
+    delta_h_evap: float  # (J/kg)
+    steps: int  # accepted integration steps
+
+    @property
+    def mass(self):
+        """Parcel mass over time (t)."""
+        return self.mass_solid / (1 - self.moisture)
+
+    @property
+    def water_removed(self):
+        """Water evaporated since the start (t), times x parcels."""
+        return self.mass[0] - self.mass
+
+    @property
+    def energy_GJ(self):
+        return self.water_removed * (1000 * self.delta_h_evap) / 1e9
+
+    @property
+    def energy_MWh(self):
+        return self.water_removed * (1000 * self.delta_h_evap) / 3.6e9
+
+    def residence_time(self, target_moisture):
+        """
+        Time (s) until every parcel reaches target_moisture (as-received
+        fraction, scalar or one per parcel), linear between the output times;
+        NaN if a parcel does not reach it within the simulated time.
+        """
+        target = np.broadcast_to(
+            np.asarray(target_moisture, dtype=float), self.moisture.shape[1:]
+        )
+        reached = self.moisture <= target
+        first = np.argmax(reached, axis=0)
+        parcels = np.arange(self.moisture.shape[1])
+        before = np.maximum(first - 1, 0)
+        w0, w1 = self.moisture[before, parcels], self.moisture[first, parcels]
+        t0, t1 = self.t[before], self.t[first]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(w0 > w1, (w0 - target) / (w0 - w1), 0.0)
+        time = t0 + fraction * (t1 - t0)
+        return np.where(reached.any(axis=0), time, np.nan)
+
+
+def _rate(X, N_c, X_c, X_eq):
+    """dX/dt of the parcels (1/s)."""
+    falling = N_c * (X - X_eq) / (X_c - X_eq)
+    return -np.maximum(np.minimum(N_c, falling), 0.0)
+
+
+def simulate_drying(
+    moisture,
+    diameter,
+    T_air,
+    T_wet_bulb,
+    t_end,
+    mass=1.0,
+    equilibrium_moisture=EQUILIBRIUM_MOISTURE,
+    critical_moisture=0.4,
+    h=50.0,
+    density=500.0,
+    delta_h_evap=DELTA_H_EVAP,
+    t_eval=None,
+    dt=None,
+    rtol=1e-6,
+    atol=1e-9,
+):
+    """
+    Integrate the drying of all parcels from 0 to t_end (s).
+
+    moisture: initial moisture (as-received fraction), diameter (m),
+    T_air and T_wet_bulb (K), mass (t), equilibrium_moisture and
+    critical_moisture (as-received fractions), h (W/m2K) and density (kg/m3,
+    dry particle) broadcast to one value per parcel.
+
+    t_eval: output times (s), default: 101 points from 0 to t_end
+    dt: fixed step (s, classical Runge-Kutta); None: adaptive step
+        (Bogacki-Shampine 3(2), error of the worst parcel below
+        atol + rtol |X|)
+    """
+    params = np.broadcast_arrays(
+        *(
+            np.asarray(x, dtype=float)
+            for x in (
+                moisture,
+                diameter,
+                T_air,
+                T_wet_bulb,
+                mass,
+                equilibrium_moisture,
+                critical_moisture,
+                h,
+                density,
+            )
+        )
+    )
+    w0, d, T_air, T_wb, mass, w_eq, w_c, h, density = (np.ravel(p) for p in params)
+    if np.any(w_eq >= w_c):
+        raise ValueError("the equilibrium moisture has to be below the critical one")
+    # dry basis moisture (kg water / kg solids)
+    X0, X_eq, X_c = w0 / (1 - w0), w_eq / (1 - w_eq), w_c / (1 - w_c)
+    area = 6 / (density * d)  # (m2 / kg solids)
+    N_c = h * np.maximum(T_air - T_wb, 0.0) * area / delta_h_evap
+
+    def f(X):
+        return _rate(X, N_c, X_c, X_eq)
+
+    if t_eval is None:
+        t_eval = np.linspace(0, t_end, 101)
+    t_eval = np.asarray(t_eval, dtype=float)
+    if np.any(np.diff(t_eval) < 0) or t_eval[0] < 0:
+        raise ValueError("t_eval has to be increasing from 0")
+    X = X0
+    floor = np.minimum(X0, X_eq)  # (parcels drier than X_eq stay as they are)
+    out = np.empty([len(t_eval), len(X)])
+    t, k, steps = 0.0, 0, 0
+    while k < len(t_eval) and t_eval[k] <= t:
+        out[k], k = X, k + 1
+
+    if dt is not None:
+        while k < len(t_eval):
+            step = min(dt, t_eval[k] - t)
+            k1 = f(X)
+            k2 = f(X + 0.5 * step * k1)
+            k3 = f(X + 0.5 * step * k2)
+            k4 = f(X + step * k3)
+            X = np.maximum(X + step / 6 * (k1 + 2 * k2 + 2 * k3 + k4), floor)
+            t, steps = t + step, steps + 1
+            while k < len(t_eval) and t_eval[k] <= t * (1 + 1e-12):
+                out[k], k = X, k + 1
+    else:
+        step = 0.01 / max(float(np.max(N_c / np.maximum(X0, 1e-9))), 1e-12)
+        k1 = f(X)
+        while k < len(t_eval):
+            step = min(step, t_eval[k] - t)
+            k2 = f(X + 0.5 * step * k1)
+            k3 = f(X + 0.75 * step * k2)
+            X_new = X + step * (2 * k1 + 3 * k2 + 4 * k3) / 9
+            k4 = f(X_new)
+            error = step * (-5 * k1 / 72 + k2 / 12 + k3 / 9 - k4 / 8)
+            norm = np.max(np.abs(error) / (atol + rtol * np.abs(X_new)))
+            if norm <= 1:
+                X, k1 = np.maximum(X_new, floor), k4
+                t, steps = t + step, steps + 1
+                while k < len(t_eval) and t_eval[k] <= t * (1 + 1e-12):
+                    out[k], k = X, k + 1
+            step *= min(5.0, max(0.2, 0.9 * (1 / max(norm, 1e-10)) ** (1 / 3)))
+
+    return DryingProfile(
+        t=t_eval,
+        moisture=out / (1 + out),
+        mass_solid=mass * (1 - w0),
+        delta_h_evap=delta_h_evap,
+        steps=steps,
+    )
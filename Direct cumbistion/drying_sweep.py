@@ -0,0 +1,113 @@
+"""
+Drying sensitivity over a grid of operating points.
+
+Thermal_drying.py evaluates one mixture for a list of target moistures. The
+same mass and energy balance is evaluated here on the full grid of
+
+    target_moisture (-) x moisture (-, initial) x mass (t) x LHV_dry (MJ/kg)
+
+in one pass with numpy broadcasting: every argument given as array is a
+dimension of the result (in this order), scalars are fixed.
+
+    sweep = drying_sweep(
+        target_moisture=np.linspace(0, 0.25, 16),
+        moisture=np.linspace(0.2, 0.6, 41),
+        mass=np.linspace(500, 2000, 31),
+        LHV_dry=17.19,
+    )
+    sweep["energy_MWh"]  # (16 x 41 x 31)
+    sweep.to_frame()     # one row per grid point
+
+A target above the initial moisture means no drying (as perform_drying).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from blending import DELTA_H_EVAP, lhv_ar
+
+DIMENSIONS = ("target_moisture", "moisture", "mass", "LHV_dry")
+RESULTS = (
+    "final_mass",  # (t)
+    "water_removed",  # (t)
+    "energy_GJ",
+    "energy_MWh",
+    "LHV_ar",  # (MJ/kg)
+    "fuel_MWh",  # fuel potential, final mass x LHV_ar
+)
+
+
+@dataclass
+class DryingSweep:
+    """Results on the grid: dims (names), coords {dim: values}, data {result: array}."""
+
+    dims: tuple
+    coords: dict
+    data: dict
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    @property
+    def shape(self):
+        return tuple(len(self.coords[dim]) for dim in self.dims)
+
+    def to_frame(self, results=RESULTS):
+        """Long table with one row per grid point and the dims as index."""
+        if self.dims:
+            index = pd.MultiIndex.from_product(
+                [self.coords[dim] for dim in self.dims], names=list(self.dims)
+            )
+        else:
+            index = pd.RangeIndex(1)
+        return pd.DataFrame(
+            {name: np.ravel(self.data[name]) for name in results}, index=index
+        )
+
+
+def drying_sweep(
+    target_moisture, moisture, mass, LHV_dry, delta_h_evap=DELTA_H_EVAP, dtype=float
+):
+    """
+    Water removed, drying energy, LHV as received and fuel potential on the
+    grid of the array arguments (see module docstring). dtype=np.float32
+    halves the memory of large grids.
+    """
+    values = dict(
+        target_moisture=target_moisture, moisture=moisture, mass=mass, LHV_dry=LHV_dry
+    )
+    dims = tuple(name for name in DIMENSIONS if np.ndim(values[name]) > 0)
+    coords = {name: np.asarray(values[name], dtype=dtype).ravel() for name in dims}
+    grid = {}
+    for name in DIMENSIONS:
+        if name in coords:
+            shape = [1] * len(dims)
+            shape[dims.index(name)] = -1
+            grid[name] = coords[name].reshape(shape)
+        else:
+            grid[name] = np.asarray(values[name], dtype=dtype)
+
+    w0 = grid["moisture"]
+    w = np.minimum(grid["target_moisture"], w0)  # (no drying if already drier)
+    # mass balance: m_solid / (1 - w_target) = m_total_final
+    mass_solid = grid["mass"] * (1 - w0)
+    final_mass = mass_solid / (1 - w)
+    water_removed = grid["mass"] - final_mass  # (t)
+    energy = water_removed * (1000 * delta_h_evap)  # (J)
+    LHV = lhv_ar(grid["LHV_dry"], w).astype(dtype, copy=False)
+    # E_fuel (MJ) = Mass (kg) * LHV_ar (MJ/kg), 1 MWh = 3600 MJ
+    fuel = final_mass * LHV / 3.6
+
+    shape = tuple(len(coords[dim]) for dim in dims)
+    data = {
+        "final_mass": final_mass,
+        "water_removed": water_removed,
+        "energy_GJ": energy / 1e9,
+        "energy_MWh": energy / 3.6e9,
+        "LHV_ar": LHV,
+        "fuel_MWh": fuel,
+    }
+    data = {name: np.broadcast_to(value, shape) for name, value in data.items()}
+    return DryingSweep(dims, coords, data)
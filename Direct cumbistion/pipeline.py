@@ -0,0 +1,135 @@
+"""
+Mixture -> drying analysis in one process.
+
+Thermal_drying.py used to read the FINAL MIXTURE row of mixture_results.csv
+written by calculate_mixture.py. Here the Blend of the mixture is passed on
+directly:
+
+    inputs = MixtureInputs.from_samples(samples, masses, target_moistures)
+    result, sweep = run_pipeline(inputs, np.linspace(0, 0.25, 16))
+
+With a cache_dir, the blend is stored under the hash of its inputs
+(<hash>.cache.npz) and reruns with unchanged inputs load it instead of
+recomputing it.
+"""
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from blending import DELTA_H_EVAP, Blend, blend
+from drying_sweep import drying_sweep
+
+CACHE_VERSION = 1  # (part of the hash, increase if the blend calculation changes)
+
+
+@dataclass(frozen=True)
+class MixtureInputs:
+    """Streams of one mixture (moistures as fractions, NaN target: not dried)."""
+
+    names: tuple
+    mass: np.ndarray  # (t)
+    moisture: np.ndarray  # (-)
+    LHV_dry: np.ndarray  # (MJ/kg)
+    ash_dry: np.ndarray  # (%)
+    target_moisture: np.ndarray  # (-)
+
+    @classmethod
+    def from_samples(cls, samples, masses, target_moistures=None):
+        """
+        Inputs from the samples dict of calculate_mixture.py ({name:
+        {"moisture_ar", "LHV_dry", "Ash_dry"}}), the masses {name: t} and the
+        drying targets {name: fraction} of the dried streams.
+        """
+        names = tuple(masses)
+        target_moistures = target_moistures or {}
+        return cls(
+            names,
+            np.array([masses[name] for name in names], dtype=float),
+            np.array([samples[name]["moisture_ar"] for name in names], dtype=float),
+            np.array([samples[name]["LHV_dry"] for name in names], dtype=float),
+            np.array([samples[name]["Ash_dry"] for name in names], dtype=float),
+            np.array(
+                [target_moistures.get(name, np.nan) for name in names], dtype=float
+            ),
+        )
+
+    def key(self):
+        """Content hash of the inputs."""
+        digest = hashlib.sha256(f"v{CACHE_VERSION}\n".encode())
+        digest.update("\n".join(self.names).encode())
+        for name in ("mass", "moisture", "LHV_dry", "ash_dry", "target_moisture"):
+            digest.update(np.ascontiguousarray(getattr(self, name), dtype="<f8"))
+        return digest.hexdigest()
+
+
+def mix(inputs, cache_dir=None):
+    """Blend of the inputs, taken from / stored in cache_dir if given."""
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"mixture_{inputs.key()[:32]}.cache.npz")
+        if os.path.exists(path):
+            with np.load(path) as f:
+                return Blend(**{k.name: f[k.name] for k in fields(Blend)})
+    result = blend(
+        inputs.mass,
+        inputs.moisture,
+        inputs.LHV_dry,
+        inputs.ash_dry,
+        inputs.target_moisture,
+    )
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **{k.name: getattr(result, k.name) for k in fields(Blend)})
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return result
+
+
+def mixture_table(inputs, result):
+    """
+    Streams and FINAL MIXTURE in the columns of mixture_results.csv, all
+    numeric (the as-received LHV of every stream after drying).
+    """
+    dried = result.moisture < result.moisture_ar
+    streams = [
+        f"{name} ({'Dry' if d else 'AR'})" for name, d in zip(inputs.names, dried)
+    ]
+    return pd.DataFrame(
+        {
+            "Stream": streams + ["FINAL MIXTURE"],
+            "Mass (ton)": np.append(result.mass, result.total_mass),
+            "Moisture (%)": np.append(result.moisture, result.mix_moisture) * 100,
+            "LHV (ar) (MJ/kg)": np.append(result.LHV_ar_streams, result.LHV_ar),
+            "LHV (dry) (MJ/kg)": np.append(result.LHV_dry_streams, result.LHV_dry),
+            "Ash (dry) (%)": np.append(result.ash_dry_streams, result.ash_dry),
+        }
+    )
+
+
+def drying_analysis(result, target_moisture, delta_h_evap=DELTA_H_EVAP):
+    """Drying sweep of a blended mixture over the target moistures (-)."""
+    if np.ndim(result.total_mass):
+        raise ValueError("drying_analysis takes the blend of one mixture")
+    return drying_sweep(
+        target_moisture,
+        float(result.mix_moisture),
+        float(result.total_mass),
+        float(result.LHV_dry),
+        delta_h_evap,
+    )
+
+
+def run_pipeline(inputs, target_moisture, delta_h_evap=DELTA_H_EVAP, cache_dir=None):
+    """Blend of the mixture and its drying sweep."""
+    result = mix(inputs, cache_dir)
+    return result, drying_analysis(result, target_moisture, delta_h_evap)
@@ -0,0 +1,158 @@
+"""
+Lab sample sheets in the layout of Data/samples.csv.
+
+The samples are side by side in blocks of 4 columns (property, unit, ar,
+dry): the first row holds the sample names, the second the basis of the
+value columns, then one row per property (moisture, ash, C, H, O, N, S, HHV,
+LHV). Cells are padded with whitespace, empty cells and property-less rows
+are skipped.
+
+    table = read_samples(["Data/samples.csv", ...])   # one row per value
+    table = complete_bases(table)                      # ar <-> dry filled in
+    samples = samples_dict(table)                      # calculate_mixture format
+    inputs = MixtureInputs.from_samples(samples, masses, targets)
+
+The files are read row by row, so the memory used per file does not depend on
+its size beyond the values it holds.
+"""
+
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from blending import H_EVAP_LHV
+
+BASES = ("ar", "dry")
+COLUMNS = ["source", "sample", "property", "unit", "basis", "value"]
+MOISTURE = "moisture"
+
+
+def iter_sample_sheet(path):
+    """(sample, property, unit, basis, value) of every value in one sheet."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        names = next(rows, [])
+        blocks = [(k, name.strip()) for k, name in enumerate(names) if name.strip()]
+        bases = [cell.strip().lower() for cell in next(rows, [])]
+        for k, _ in blocks:
+            found = tuple(bases[k + 2 : k + 4])
+            if found and found != BASES:
+                raise ValueError(
+                    f"{path}: expected the columns ar, dry for block at column "
+                    f"{k + 1}, found {found}"
+                )
+        for row in rows:
+            for k, sample in blocks:
+                cells = [cell.strip() for cell in row[k : k + 4]]
+                if len(cells) < 4 or not cells[0]:
+                    continue
+                name, unit = cells[0], cells[1]
+                for basis, cell in zip(BASES, cells[2:]):
+                    if cell:
+                        yield sample, name, unit, basis, float(cell)
+
+
+def read_samples(paths):
+    """
+    Typed long table (source, sample, property, unit, basis, value) of any
+    number of sample sheets (path or list of paths). The source is the path
+    as given, so sheets of the same name in different folders stay apart.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    columns = {name: [] for name in COLUMNS}
+    for path in paths:
+        source = os.path.normpath(os.fspath(path))
+        for record in iter_sample_sheet(path):
+            columns["source"].append(source)
+            for name, value in zip(COLUMNS[1:], record):
+                columns[name].append(value)
+    table = pd.DataFrame(columns)
+    for name in ("source", "sample", "property", "unit"):
+        table[name] = table[name].astype("category")
+    table["basis"] = pd.Categorical(table["basis"], categories=BASES)
+    table["value"] = table["value"].astype(float)
+    return table
+
+
+def to_dry(value, moisture, prop):
+    """
+    Dry basis of as-received values (vectorized): w = moisture fraction,
+    mass fractions and HHV / (1 - w), LHV (LHV_ar + 2.442 w) / (1 - w).
+    """
+    value, moisture = np.asarray(value, dtype=float), np.asarray(moisture, dtype=float)
+    is_LHV = np.asarray(prop) == "LHV"
+    return (value + np.where(is_LHV, H_EVAP_LHV * moisture, 0.0)) / (1 - moisture)
+
+
+def to_ar(value, moisture, prop):
+    """As-received basis of dry values (vectorized), the inverse of to_dry."""
+    value, moisture = np.asarray(value, dtype=float), np.asarray(moisture, dtype=float)
+    is_LHV = np.asarray(prop) == "LHV"
+    return value * (1 - moisture) - np.where(is_LHV, H_EVAP_LHV * moisture, 0.0)
+
+
+def complete_bases(table):
+    """
+    Add the values missing on one basis, converted from the other with the
+    as-received moisture of the sample (property "moisture" in %wt). The
+    moisture itself only has an as-received value.
+    """
+    duplicated = table.duplicated(["source", "sample", "property", "basis"])
+    if duplicated.any():
+        rows = table.loc[duplicated, ["source", "sample", "property", "basis"]]
+        first = ", ".join(map(str, rows.iloc[0]))
+        raise ValueError(
+            f"{len(rows)} values are given more than once (first: {first}); "
+            "is a sheet read twice?"
+        )
+    wide = table.pivot_table(
+        index=["source", "sample", "property", "unit"],
+        columns="basis",
+        values="value",
+        aggfunc="first",
+        observed=True,
+    ).reindex(columns=list(BASES))
+    moisture = (
+        table[(table["property"] == MOISTURE) & (table["basis"] == "ar")]
+        .set_index(["source", "sample"])["value"]
+        .astype(float)
+        / 100
+    )
+    keys = wide.index.droplevel(["property", "unit"])
+    w = moisture.reindex(keys).to_numpy()
+    prop = wide.index.get_level_values("property").to_numpy(dtype=object)
+    convertible = prop != MOISTURE
+    ar, dry = wide["ar"].to_numpy(), wide["dry"].to_numpy()
+    fill_ar = convertible & np.isnan(ar) & ~np.isnan(dry)
+    fill_dry = convertible & np.isnan(dry) & ~np.isnan(ar)
+    ar = np.where(fill_ar, to_ar(dry, w, prop), ar)
+    dry = np.where(fill_dry, to_dry(ar, w, prop), dry)
+    wide = pd.DataFrame({"ar": ar, "dry": dry}, index=wide.index)
+    long = wide.rename_axis(columns="basis").stack(future_stack=True).dropna()
+    result = long.rename("value").reset_index()[COLUMNS]
+    for name in ("source", "sample", "property", "unit"):
+        result[name] = result[name].astype("category")
+    result["basis"] = pd.Categorical(result["basis"], categories=BASES)
+    return result
+
+
+def samples_dict(table):
+    """
+    {sample: {"moisture_ar", "LHV_dry", "Ash_dry"}} as in calculate_mixture.py
+    (moisture as fraction), from a table completed with complete_bases.
+    """
+    value = table.set_index(["sample", "property", "basis"])["value"]
+    if value.index.duplicated().any():
+        duplicated = value.index[value.index.duplicated()].get_level_values(0)
+        raise ValueError(f"samples in several sheets: {sorted(set(duplicated))}")
+    samples = {}
+    for sample in table["sample"].unique():
+        samples[str(sample)] = {
+            "moisture_ar": float(value[(sample, MOISTURE, "ar")]) / 100,
+            "LHV_dry": float(value[(sample, "LHV", "dry")]),
+            "Ash_dry": float(value[(sample, "ash", "dry")]),
+        }
+    return samples
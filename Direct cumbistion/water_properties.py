@@ -0,0 +1,273 @@
+"""
+Latent and sensible heat of water from a precomputed property table.
+
+Thermal_drying.py uses a constant heat of evaporation (2.5735 MJ/kg). The
+WaterTable gives the heat as function of temperature and pressure from the
+water model of Cantera (ct.Water()), but without setting Cantera states in
+a sweep: the properties are tabulated once on dense grids and interpolated
+linearly, vectorized over any number of points.
+
+    table = water_table()                           # built once, then cached
+    table.latent_heat(T)                            # (J/kg), T in K
+    table.evaporation_energy(T_feed=288.15, P=101325.0, T_vapor=393.15)
+
+    # drying energy with the heat at the dryer conditions
+    drying_sweep(..., delta_h_evap=table.evaporation_energy(288.15, 101325.0))
+
+Tables:
+    saturation  T (K) -> P_sat, h_liquid, h_vapor (saturated liquid / vapor)
+    superheat   (log P, T - T_sat) -> h_vapor(T, P) - h_vapor,sat(P)
+
+When a table is built, the grids are refined until the interpolated
+enthalpies differ from Cantera by less than `tolerance` (J/kg) at random
+check points; the reached error is stored in the table (`table.error`).
+
+The table is written to Data/water_properties.cache.npz and reused as long as its
+ranges are the same and its error is below the requested tolerance, so
+Cantera is only needed to build it. Building it with Cantera takes about 5
+minutes (every grid point is a Cantera state), loading it a few milliseconds.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+CACHE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "Data", "water_properties.cache.npz"
+)
+ONE_ATM = 101325.0  # (Pa)
+T_RANGE = (273.16, 623.15)  # (K) saturation table, triple point to 350 °C
+P_RANGE = (611.7, 1.0e7)  # (Pa) superheat table
+SUPERHEAT_MAX = 400.0  # (K) above saturation
+TOLERANCE = 50.0  # (J/kg)
+
+_tables = {}  # {(path, tolerance): WaterTable}
+
+
+class WaterTable:
+    """Interpolation tables of the saturation and superheated vapor states."""
+
+    def __init__(
+        self, T, P_sat, h_liquid, h_vapor, log_P, superheat, h_superheat, info
+    ):
+        self.T = T
+        self.P_sat = P_sat
+        self.h_liquid = h_liquid
+        self.h_vapor = h_vapor
+        self.log_P = log_P
+        self.superheat = superheat
+        self.h_superheat = h_superheat  # (log_P x superheat)
+        self.info = info
+        self._log_P_sat = np.log(P_sat)
+
+    @property
+    def error(self):
+        """Largest interpolation error at the check points (J/kg)."""
+        return self.info["error"]
+
+    # saturation
+
+    def saturation_pressure(self, T):
+        """Saturation pressure (Pa) at T (K)."""
+        return np.exp(np.interp(T, self.T, self._log_P_sat))
+
+    def saturation_temperature(self, P):
+        """Boiling temperature (K) at the pressure P (Pa)."""
+        return np.interp(np.log(P), self._log_P_sat, self.T)
+
+    def liquid_enthalpy(self, T):
+        """Enthalpy of (saturated) liquid water at T (K), J/kg."""
+        return np.interp(T, self.T, self.h_liquid)
+
+    def latent_heat(self, T):
+        """Heat of evaporation at T (K), J/kg."""
+        return np.interp(T, self.T, self.h_vapor - self.h_liquid)
+
+    def latent_heat_at_pressure(self, P):
+        """Heat of evaporation at the boiling point of the pressure P (Pa), J/kg."""
+        return self.latent_heat(self.saturation_temperature(P))
+
+    # superheated vapor
+
+    def vapor_enthalpy(self, T, P):
+        """Enthalpy of vapor at T (K) and P (Pa), at least saturated, J/kg."""
+        T_sat = self.saturation_temperature(P)
+        h_sat = np.interp(T_sat, self.T, self.h_vapor)
+        return h_sat + _interp2(
+            self.log_P, self.superheat, self.h_superheat, np.log(P), T - T_sat
+        )
+
+    def evaporation_energy(self, T_feed=288.15, P=ONE_ATM, T_vapor=None):
+        """
+        Heat (J/kg water) to heat liquid water from T_feed to the boiling
+        point at P, evaporate it and superheat the vapor to T_vapor (K,
+        default: no superheating).
+        """
+        T_boil = self.saturation_temperature(P)
+        sensible = self.liquid_enthalpy(T_boil) - self.liquid_enthalpy(T_feed)
+        if T_vapor is None:
+            return sensible + self.latent_heat(T_boil)
+        return sensible + self.vapor_enthalpy(T_vapor, P) - self.liquid_enthalpy(T_boil)
+
+    # storage
+
+    def save(self, path):
+        """Write the table to an .npz file (atomically)."""
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    T=self.T,
+                    P_sat=self.P_sat,
+                    h_liquid=self.h_liquid,
+                    h_vapor=self.h_vapor,
+                    log_P=self.log_P,
+                    superheat=self.superheat,
+                    h_superheat=self.h_superheat,
+                    info=json.dumps(self.info),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            arrays = {name: f[name] for name in f.files if name != "info"}
+            info = json.loads(str(f["info"]))
+        return cls(info=info, **arrays)
+
+
+def _interp2(x_grid, y_grid, table, x, y):
+    """Bilinear interpolation on a regular grid (clamped at its edges)."""
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    fx = np.clip((x - x_grid[0]) / (x_grid[1] - x_grid[0]), 0, len(x_grid) - 1)
+    fy = np.clip((y - y_grid[0]) / (y_grid[1] - y_grid[0]), 0, len(y_grid) - 1)
+    i = np.minimum(fx.astype(int), len(x_grid) - 2)
+    j = np.minimum(fy.astype(int), len(y_grid) - 2)
+    fx, fy = fx - i, fy - j
+    return (
+        table[i, j] * (1 - fx) * (1 - fy)
+        + table[i + 1, j] * fx * (1 - fy)
+        + table[i, j + 1] * (1 - fx) * fy
+        + table[i + 1, j + 1] * fx * fy
+    )
+
+
+def _saturation(fluid, T):
+    P, h_l, h_v = (np.empty(len(T)) for _ in range(3))
+    for k, T_k in enumerate(T):
+        fluid.TQ = T_k, 0
+        P[k], h_l[k] = fluid.P, fluid.enthalpy_mass
+        fluid.TQ = T_k, 1
+        h_v[k] = fluid.enthalpy_mass
+    return P, h_l, h_v
+
+
+def _superheat(fluid, P, dT):
+    """Vapor enthalpy above saturation (len(P) x len(dT))."""
+    h = np.zeros([len(P), len(dT)])
+    for i, P_i in enumerate(P):
+        fluid.PQ = P_i, 1
+        T_sat, h_sat = fluid.T, fluid.enthalpy_mass
+        for j, dT_j in enumerate(dT):
+            if dT_j > 0:
+                fluid.TP = T_sat + dT_j, P_i
+                h[i, j] = fluid.enthalpy_mass - h_sat
+    return h
+
+
+def build_table(
+    tolerance=TOLERANCE, n_T=351, n_P=41, n_superheat=81, fluid=None, seed=0
+):
+    """
+    Tabulate the water model of Cantera (or `fluid`, any object with the
+    Cantera PureFluid state setters). The grids are doubled until the
+    interpolation error at random check points is below tolerance (J/kg).
+    """
+    if fluid is None:
+        try:
+            import cantera as ct
+        except ImportError:
+            raise ImportError(
+                "building the water property table needs Cantera (pip install cantera)"
+            ) from None
+        fluid = ct.Water()
+    rng = np.random.default_rng(seed)
+    n_check = 200
+    T_check = rng.uniform(*T_RANGE, n_check)
+    P_check = np.exp(rng.uniform(*np.log(P_RANGE), n_check))
+    dT_check = rng.uniform(0, SUPERHEAT_MAX, n_check)
+    exact_sat = _saturation(fluid, T_check)
+    exact_vapor = np.empty(n_check)
+    for k in range(n_check):
+        fluid.PQ = P_check[k], 1
+        fluid.TP = fluid.T + dT_check[k], P_check[k]
+        exact_vapor[k] = fluid.enthalpy_mass
+
+    for _ in range(6):
+        T = np.linspace(*T_RANGE, n_T)
+        log_P = np.linspace(*np.log(P_RANGE), n_P)
+        superheat = np.linspace(0, SUPERHEAT_MAX, n_superheat)
+        info = {
+            "tolerance": tolerance,
+            "T_range": list(T_RANGE),
+            "P_range": list(P_RANGE),
+            "superheat_max": SUPERHEAT_MAX,
+            "grid": [n_T, n_P, n_superheat],
+        }
+        table = WaterTable(
+            T,
+            *_saturation(fluid, T),
+            log_P,
+            superheat,
+            _superheat(fluid, np.exp(log_P), superheat),
+            info,
+        )
+        T_sat = table.saturation_temperature(P_check)
+        errors = [
+            np.abs(table.liquid_enthalpy(T_check) - exact_sat[1]),
+            np.abs(table.latent_heat(T_check) - (exact_sat[2] - exact_sat[1])),
+            np.abs(table.vapor_enthalpy(T_sat + dT_check, P_check) - exact_vapor),
+        ]
+        info["error"] = float(max(e.max() for e in errors))
+        if info["error"] < tolerance:
+            return table
+        n_T, n_P, n_superheat = 2 * n_T - 1, 2 * n_P - 1, 2 * n_superheat - 1
+    raise ValueError(
+        f"interpolation error {info['error']:.3g} J/kg is above the tolerance "
+        f"{tolerance:.3g} J/kg"
+    )
+
+
+def water_table(path=CACHE_FILE, tolerance=TOLERANCE, rebuild=False):
+    """
+    Water property table, loaded from path or built with Cantera and saved
+    there if it is missing, built with other parameters or rebuild=True.
+    Building takes about 5 minutes with Cantera.
+    """
+    key = (os.path.abspath(path), tolerance)
+    if not rebuild and key in _tables:
+        return _tables[key]
+    table = None
+    if not rebuild and os.path.exists(path):
+        table = WaterTable.load(path)
+        info = table.info
+        same_grid = (info["T_range"], info["P_range"], info["superheat_max"]) == (
+            list(T_RANGE),
+            list(P_RANGE),
+            SUPERHEAT_MAX,
+        )
+        if not (same_grid and info["error"] < tolerance):
+            table = None
+    if table is None:
+        table = build_table(tolerance)
+        table.save(path)
+    _tables[key] = table
+    return table